@@ -1,4 +1,5 @@
 import go
+import go_bitboard
 import numpy as np
 #connectar melhor as regras
 class Connect2Game:
@@ -14,43 +15,38 @@ class Connect2Game:
         return np.zeros((self.row_count, self.column_count))
     
     def get_next_state(self, state, action, player):
-        b = go.GameState(state, play_idx=1)
-        b.turn=player
+        if action == self.column_count**2:
+            return state
         row = action// self.column_count
         col = action % self.column_count
 
-        if action == self.column_count**2:
-            boa= b.pass_turn()
-        else:
-            boa = b.move(row,col)
-        return boa.board
+        b = go_bitboard.NodeState(state, turn=player, play_idx=1)
+        boa = b.move(row,col)
+        return go_bitboard.to_array(boa.black, boa.white, boa.geo, dtype=state.dtype)
     
+    # as jogadas e a legalidade vêm do mesmo motor (NodeState, com superko posicional); o board anterior
+    # conta para o superko
     def get_valid_moves(self, state,previous):
-        valid_moves = [0] * self.action_size
-        valid_moves[-1]=1
-        b = go.GameState(state, play_idx=1)
-        if previous is not None:
-            b.previous_boards[1]=previous
-            
-        possi=go.check_possible_moves(b)
-        for i in possi:
-            action = i[0] * self.column_count + i[1]
-            valid_moves[action]=1
-        return valid_moves
+        b = go_bitboard.NodeState(state, previous_boards={1: previous, -1: None})
+        return b.legal_mask()
     
     def get_value_and_terminated(self, state, pas):
-        b = go.GameState(state, play_idx=1)
-        if pas:
-            b.pass_count = 2
-            self.game_over = True
-        _ , terminated =b.get_value_and_terminated(b)
+        # o jogo só acaba com dois pass seguidos, e só nesse caso é preciso contar os scores
+        if not pas:
+            return 0, False
+        self.game_over = True
         value = self.winner(state)
-        return value, terminated
+        return value, True
     
     def winner(self, state):
         scores = self.scores(state)
         value = value_scores(scores)
         return value
+
+    def winners(self, states):
+        # vencedor de um batch de boards (N,n,n), por exemplo para contar os resultados na arena
+        scores = go.score_boards(states)
+        return np.sign(scores[:, 0] - scores[:, 1]).astype(int)
     
     def get_opponent(self, player):
         return -player
@@ -72,11 +68,70 @@ class Connect2Game:
         return encoded_state
     
     def scores(self, state):
-        b = go.GameState(state, play_idx=1)
-        return b.get_scores()
+        scores = go.score_boards(state[None])[0]
+        return {1: int(scores[0]), -1: float(scores[1])}
+
+    def get_hash(self, state):
+        # hash de Zobrist do board, para usar como chave de caches (os estados já estão na perspetiva do jogador)
+        return go.zobrist_hash(state)
     
 
 
+# Variante em que os estados são go_bitboard.NodeState em vez de arrays: cada estado guarda a vez, o
+# contador de pass e os hashes das posições do jogo, por isso cada jogada no MCTS é só um move incremental
+# (sem reconstruir o estado a partir do array) e o superko fica correto sem o board anterior (pre) nem o
+# pas calculado pelo MCTS.search, que aqui são ignorados.
+# Os estados têm as cores absolutas, por isso change_perspective não faz nada, o get_encoded_state usa
+# board*turn (o jogador que joga fica a 1, como nos arrays neutros) e o value é na perspetiva de state.turn.
+class StatefulConnect2Game(Connect2Game):
+    def __repr__(self):
+        return "GoState"
+
+    def get_initial_state(self):
+        return go_bitboard.NodeState(np.zeros((self.row_count, self.column_count)))
+
+    # estado a partir de um tabuleiro neutro (o jogador que joga a 1), como os que o client passa ao MCTS
+    def from_board(self, board, previous=None):
+        return go_bitboard.NodeState(board, previous_boards={1: previous})
+
+    def get_next_state(self, state, action, player=None):
+        if action == self.column_count**2:
+            return state.pass_turn()
+        return state.move(action // self.column_count, action % self.column_count)
+
+    def get_valid_moves(self, state, previous=None):
+        return state.legal_mask()
+
+    def get_value_and_terminated(self, state, pas=None):
+        if not go.is_game_finished(state):
+            return 0, False
+        return self.winner(state), True
+
+    def winner(self, state):
+        winner, _ = state.get_winner_model()
+        return winner * state.turn
+
+    def scores(self, state):
+        return state.get_scores()
+
+    def change_perspective(self, state, player):
+        return state
+
+    # tabuleiro na perspetiva do jogador que joga
+    def neutral_board(self, state):
+        return state.board * state.turn
+
+    def get_encoded_state(self, state):
+        if isinstance(state, go_bitboard.NodeState):
+            state = self.neutral_board(state)
+        elif len(state) and isinstance(state[0], go_bitboard.NodeState):
+            state = np.stack([self.neutral_board(s) for s in state])
+        return super().get_encoded_state(state)
+
+    def get_hash(self, state):
+        return go.zobrist_hash(self.neutral_board(state))
+
+
 def value_scores(scores):
     if scores[1] > scores[-1]:
         return 1
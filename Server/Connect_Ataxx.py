@@ -2,20 +2,50 @@ import atax
 import numpy as np
 
 class Atax():
-    def __init__(self,n):
+    #com canonical_clones=True os clones para a mesma casa (que dão todos o mesmo estado) são uma só ação:
+    #o clone a partir da primeira casa vizinha (atax.Rings.clone_action), mesmo que essa casa não tenha peça,
+    #porque no clone a origem não é usada pelo get_next_state; para enviar uma ação ao server é preciso
+    #convertê-la com o get_move (o client_ataxx.ipynb e o atax_engine fazem isso), senão a origem pode
+    #estar vazia ou bloqueada e o server recusa a jogada
+    #layout é o tabuleiro inicial (por exemplo do atax.load_layout), com 8 nas casas bloqueadas; sem layout o
+    #tabuleiro é vazio com as peças nos cantos
+    #max_plies é o número máximo de jogadas de um jogo (None para não ter limite); quando chega ao limite, ou
+    #quando uma posição se repete 3 vezes, o jogo acaba e ganha quem tiver mais peças
+    def __init__(self,n,canonical_clones=False,layout=None,max_plies=None):
         self.row_count = n
         self.column_count = n
         self.action_size = n*n*24
+        self.canonical_clones = canonical_clones
+        self.max_plies = max_plies
+        self.layout = None if layout is None else np.array(layout, dtype=float)
+        #máscaras das jogadas sem as casas bloqueadas (calculadas uma vez por layout)
+        self.rings = atax.rings(n, 0 if layout is None else atax.bits_of(layout, 8))
         self.num_to_pos= { 0 :(-2,-2),1 :(-2,-1),2 :(-2,0),3:(-2,1),4:(-2,2),
                             5:(-1,-2),6:(-1,-1),7:(-1,0),8:(-1,1),9:(-1,2),
                             10:(0,-2),11:(0,-1),12:(0,1),13:(0,2),
                             14:(1,-2),15:(1,-1),16:(1,0),17:(1,1),18:(1,2),
                             19:(2,-2),20:(2,-1),21:(2,0),22:(2,1),23:(2,2)}
         self.pos_to_num= {v: k for k, v in self.num_to_pos.items()}
+        #índices de cada casa e do destino de cada uma das suas 24 jogadas no tabuleiro com 2 casas de margem
+        #(achatado): a máscara das ações é own[origem] & empty[destino], sem criar Moves
+        p = n+4
+        self.board_index = np.array([(i+2)*p + j+2 for i in range(n) for j in range(n)])
+        self.target_index = self.board_index[:, None] + np.array([dx*p + dy for dx, dy in atax.OFFSETS])
+        self.clone_offsets = np.array([max(abs(dx), abs(dy)) == 1 for dx, dy in atax.OFFSETS])
+        r = self.rings
+        self.clone_actions = np.array(r.clone_action)
+        #ação canónica de cada ação (os clones passam para o clone_action do destino, os saltos ficam iguais)
+        self.canonical_actions = np.arange(self.action_size)
+        for s in range(n*n):
+            for t, k in r.targets[s]:
+                if r.clone[s] >> t & 1:
+                    self.canonical_actions[s*24 + k] = r.clone_action[t]
     def __repr__(self):
         return "Atax"
         
     def get_initial_state(self):
+        if self.layout is not None:
+            return self.layout.copy()
         b=np.zeros((self.row_count, self.column_count))
         b[0][0]=1
         b[0][self.column_count-1]=-1
@@ -43,25 +73,89 @@ class Atax():
         return boa
     
     def get_valid_moves(self, state,player):
-        valid_moves = [0] * self.action_size
-        b = atax.State(state,player)
-        possi=b.available_moves(1)
-        for i in possi:
-            dicti=(i.xf - i.xi,i.yf-i.yi)
-            action = self.pos_to_num[dicti] + (i.xi*self.column_count + i.yi)*24
-            #por a ir ao dicionario
-            valid_moves[action]=1
-        return valid_moves
+        #o estado já está na perspetiva do jogador 1
+        return self.valid_moves_mask(state)
+    
+    #máscara (0/1) das ações válidas do jogador 1 num estado (n,n) ou num batch de estados (N,n,n)
+    def valid_moves_mask(self, states):
+        states = np.asarray(states)
+        n = self.row_count
+        #a margem tem 8 (casa bloqueada), para os destinos fora do tabuleiro não contarem como vazios
+        padded = np.full((states.size//(n*n), n+4, n+4), 8, dtype=states.dtype)
+        padded[:, 2:-2, 2:-2] = states.reshape(-1, n, n)
+        padded = padded.reshape(len(padded), -1)
+        own = padded[:, self.board_index] == 1
+        empty = padded == 0
+        #(N, n*n, 24): peça do jogador na origem e casa vazia no destino
+        valid = own[:, :, None] & empty[:, self.target_index]
+        if self.canonical_clones:
+            #destinos vazios com uma peça do jogador à distância 1, cada um só com a ação canónica
+            cloned = (padded == 1)[:, self.target_index[:, self.clone_offsets]].any(axis=2) & empty[:, self.board_index]
+            valid[:, :, self.clone_offsets] = False
+            valid = valid.reshape(len(valid), -1)
+            valid[:, self.clone_actions] = cloned
+        return valid.reshape(states.shape[:-2] + (self.action_size,)).astype(np.uint8)
     
-    def get_value_and_terminated(self, state):
+    #converte uma ação para a jogada (xi,yi,xf,yf) a enviar ao server; num clone canónico a origem
+    #passa a ser uma peça do jogador vizinha do destino. state é o tabuleiro na perspetiva do jogador
+    #que joga (peças dele a 1), como o que é dado ao MCTS
+    def get_move(self, state, action):
+        xi, yi = divmod(action//24, self.column_count)
+        dx, dy = self.num_to_pos[action%24]
+        xf, yf = xi+dx, yi+dy
+        if abs(dx)<=1 and abs(dy)<=1 and state[xi][yi] != 1:
+            r = self.rings
+            own = r.clone[xf*self.column_count + yf] & atax.bits_of(state, 1)
+            if own:
+                xi, yi = divmod((own & -own).bit_length() - 1, self.column_count)
+        return xi, yi, xf, yf
+    
+    #state pode ser o array do tabuleiro ou um atax.State; com o State as contagens e as jogadas possíveis
+    #já estão guardadas no estado (atualizadas pelo execute_move) e o caso normal (jogo não acabou) é O(1)
+    #As repetições e o número de jogadas vêm do State (com track_history()) ou, para os arrays, do history
+    #preenchido com o record (com as posições todas do jogo, incluindo a atual)
+    def get_value_and_terminated(self, state, history=None):
         value,terminated = self.winner(state)
+        if not terminated and self.adjudicate(state, history):
+            return self.piece_winner(state), True
         return value, terminated
     
+    #acrescenta a posição ao history (dicionário hash -> número de vezes) e retorna o número de vezes
+    #que a posição já apareceu
+    def record(self, history, state):
+        h = int(atax.position_hash(state))
+        history[h] = history.get(h, 0) + 1
+        return history[h]
+    
+    #verifica se o jogo acaba por repetição (3 vezes a mesma posição) ou por chegar ao max_plies
+    def adjudicate(self, state, history=None):
+        if isinstance(state, atax.State):
+            repetitions, plies = state.repetitions(), state.ply
+        elif history is not None:
+            repetitions = history.get(int(atax.position_hash(state)), 0)
+            plies = sum(history.values()) - 1
+        else:
+            return False
+        return repetitions >= 3 or (self.max_plies is not None and plies >= self.max_plies)
+    
+    #vencedor pela contagem das peças (0 se empatado)
+    def piece_winner(self, state):
+        if isinstance(state, atax.State):
+            c = state.piece_counts()
+            return int(np.sign(c[1] - c[-1]))
+        pecas = self.count(state)
+        return int(np.sign(pecas[1] - pecas[-1]))
+    
     def winner(self, state):
-        b=atax.State(state,1)
-        pecas= self.count(state)
-        b1=b.available_moves(1).size
-        b_1=b.available_moves(-1).size
+        if isinstance(state, atax.State):
+            c = state.piece_counts()
+            pecas = [c[0], c[1], c[-1]]
+            has_move = state.has_move
+        else:
+            pecas= self.count(state)
+            r = self.rings
+            empty = atax.bits_of(state, 0)
+            has_move = lambda player: atax.has_moves(atax.bits_of(state, player), empty, r)
         if pecas[0] == 0:
             if pecas[1] == pecas[2]:
                 return 0,True
@@ -72,15 +166,12 @@ class Atax():
             return -1,True
         elif pecas[-1] == 0:
             return 1,True
-        
-        b1=b.available_moves(1).size
-        b_1=b.available_moves(-1).size
             
-        if b1==0:
+        if not has_move(1):
             if pecas[1] < pecas[-1] + pecas[0]:
                 return -1,True
             else: return 1,True
-        if b_1==0:
+        if not has_move(-1):
             if pecas[-1] < pecas[1] + pecas[0]:
                 return 1,True
             else: return -1,True
@@ -88,16 +179,8 @@ class Atax():
     
     def count(self,state):
         """counts pieces"""
-        pecas=[0,0,0]
-        for i in range(0, self.row_count):
-            for j in range(0, self.column_count):
-                if state[i][j] == 0:
-                    pecas[0]+=1
-                elif state[i][j] == 1:
-                    pecas[1] +=1
-                else:
-                    pecas[-1] +=1
-        return pecas
+        #as casas bloqueadas (8) não contam
+        return [atax.bits_of(state, 0).bit_count(), atax.bits_of(state, 1).bit_count(), atax.bits_of(state, -1).bit_count()]
     
     def get_opponent(self, player):
         return -player
@@ -106,7 +189,8 @@ class Atax():
         return -value
     
     def change_perspective(self, state, player):
-        return state * player
+        #as casas bloqueadas ficam com 8
+        return np.where(state == 8, 8, state * player)
     
     def get_encoded_state(self, state):
         encoded_state = np.stack(
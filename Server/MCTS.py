@@ -7,130 +7,81 @@ import random
 import torch
 import math
 from torch.autograd import Variable
+from mcts_tree import Tree, predict, evaluate
 
 
-class Node:
-    def __init__(self, game, args, state, parent=None, action_taken=None, prior=0, visit_count=0):
-        self.game = game
-        self.args = args
-        self.state = state
-        self.parent = parent
-        self.action_taken = action_taken
-        self.prior = prior
-        
-        self.children = []
-        
-        self.visit_count = visit_count
-        self.value_sum = 0
-        
-    def is_fully_expanded(self):
-        return len(self.children) > 0
-    
-    def select(self):
-        best_child = None
-        best_ucb = -np.inf
-        
-        for child in self.children:
-            ucb = self.get_ucb(child)
-            if ucb > best_ucb:
-                best_child = child
-                best_ucb = ucb
-                
-        return best_child
-    
-    def get_ucb(self, child):
-        if child.visit_count == 0:
-            q_value = 0
-        else:
-            q_value = 1 - ((child.value_sum / child.visit_count) + 1) / 2
-        return q_value + self.args['C'] * (math.sqrt(self.visit_count) / (child.visit_count + 1)) * child.prior
-    
-    def expand(self, policy):
-        for action, prob in enumerate(policy):
-            if prob > 0:
-                child_state = self.state.copy()
-                child_state = self.game.get_next_state(child_state, action, 1)
-                child_state = self.game.change_perspective(child_state, player=-1)
-
-                child = Node(self.game, self.args, child_state, self, action, prob)
-                self.children.append(child)
-                
-        return child
-            
-    def backpropagate(self, value):
-        self.value_sum += value
-        self.visit_count += 1
-        
-        value = self.game.get_opponent_value(value)
-        if self.parent is not None:
-            self.parent.backpropagate(value)  
-
-
-    
 class MCTS:
-    def __init__(self, game, args, model):
+    #cache (eval_cache.EvalCache, opcional): avaliações da rede já feitas, partilhadas entre jogadas
+    def __init__(self, game, args, model, cache=None):
         self.game = game
         self.args = args
         self.model = model
+        self.cache = cache
         
+    #a árvore é um mcts_tree.Tree (arrays com um índice por nó)
     @torch.no_grad()
     def search(self, state,pre =None):
         #aqui buscar tabuleiro antigo
-        root = Node(self.game, self.args, state, visit_count=1)
+        tree = Tree(self.game, self.args)
+        root = tree.add_root(state, visit_count=1)
         
-        policy, _ = self.model(
-            torch.tensor(self.game.get_encoded_state(state), device=self.model.device).unsqueeze(0)
-        )
-        policy = torch.softmax(policy, axis=1).squeeze(0).cpu().numpy()
+        policy = predict(self.model, self.game, [state], self.cache)[0][0]
         policy = (1 - self.args['dirichlet_epsilon']) * policy + self.args['dirichlet_epsilon'] \
             * np.random.dirichlet([self.args['dirichlet_alpha']] * self.game.action_size)
         #por tabuleiro,dentro tornar em gamestate
-        valid_moves = self.game.get_valid_moves(root.state, pre)
+        valid_moves = self.game.get_valid_moves(state, pre)
         policy *= valid_moves
         policy /= np.sum(policy)
-        root.expand(policy)
+        tree.expand(root, policy)
 
         
-        for search in range(self.args['num_searches']):
-            node = root
-            pas=False###
-            pre = None
-            
-            while node.is_fully_expanded():
-                node = node.select()
-            #ter de por aqui tambem  
-            if node.parent is not None:
-                if(node.parent.action_taken ==self.game.action_size-1 and node.action_taken== self.game.action_size-1):
-                    pas=True 
-            value, is_terminal = self.game.get_value_and_terminated(node.state,pas)
-            value = self.game.get_opponent_value(value)
+        #com leaf_batch_size > 1 as folhas são avaliadas em batches, com virtual loss (ver o mcts_tree)
+        batch_size = self.args.get('leaf_batch_size', 1)
+        search = 0
+        while search < self.args['num_searches']:
+            leaves, states, valid = [], [], []
+            while len(leaves) < batch_size and search < self.args['num_searches']:
+                pas=False###
+                pre = None
+                
+                node = tree.select_leaf(root, virtual_loss=batch_size > 1)
+                search += 1
+                #ter de por aqui tambem  
+                parent = tree.parent[node]
+                pass_action = self.game.action_size-1
+                if parent >= 0:
+                    if(tree.action_taken[parent] == pass_action and tree.action_taken[node] == pass_action):
+                        pas=True 
+                value, is_terminal = self.game.get_value_and_terminated(tree.states[node],pas)
+                value = self.game.get_opponent_value(value)
 
-            if not is_terminal:
-                policy, value = self.model(
-                    torch.tensor(self.game.get_encoded_state(node.state), device=self.model.device).unsqueeze(0)
-                )
-                policy = torch.softmax(policy, axis=1).squeeze(0).cpu().numpy()
+                if is_terminal or node in leaves:
+                    if batch_size > 1:
+                        tree.revert_virtual_loss(node)
+                    if not is_terminal:
+                        #a folha já está no batch: avalia o batch antes de continuar
+                        search -= 1
+                        break
+                    tree.backpropagate(node, value)
+                    continue
                 
-                if node.parent is not  None:
-                    if node.parent.parent  is not None:
-                        pre= node.parent.parent.state
+                if parent >= 0:
+                    if tree.parent[parent] >= 0:
+                        pre= tree.states[tree.parent[parent]]
                 
                 #get_valid_moves
-                valid_moves = self.game.get_valid_moves(node.state, pre)
-                policy *= valid_moves
-                policy /= np.sum(policy)
-                
-                pre=None
-                value = value.item()
-                
-                node.expand(policy)
-                
-            node.backpropagate(value)    
+                leaves.append(node)
+                states.append(tree.states[node])
+                valid.append(self.game.get_valid_moves(tree.states[node], pre))
+            
+            if not leaves:
+                continue
+            policies, values = evaluate(self.model, self.game, states, valid, self.cache)
+            for node, policy, value in zip(leaves, policies, values):
+                if batch_size > 1:
+                    tree.revert_virtual_loss(node)
+                tree.expand(node, policy)
+                tree.backpropagate(node, value)
             
             
-        action_probs = np.zeros(self.game.action_size)
-        for child in root.children:
-            action_probs[child.action_taken] = child.visit_count
-        action_probs /= np.sum(action_probs)
-        return action_probs
-        
\ No newline at end of file
+        return tree.action_probs(root)
@@ -1,125 +1,89 @@
 import numpy as np
 import torch
 import math
-
-class Node:
-    def __init__(self, game, args, state,parent=None, action_taken=None, prior=0, visit_count=0):
-        self.game = game
-        self.args = args
-        self.state = state
-        self.parent = parent
-        self.action_taken = action_taken
-        self.prior = prior
-        
-        self.children = []
-        
-        self.visit_count = visit_count
-        self.value_sum = 0
-        
-    def is_fully_expanded(self):
-        return len(self.children) > 0
-    
-    def select(self):
-        best_child = None
-        best_ucb = -np.inf
-        
-        for child in self.children:
-            ucb = self.get_ucb(child)
-            if ucb > best_ucb:
-                best_child = child
-                best_ucb = ucb
-                
-        return best_child
-    
-    def get_ucb(self, child):
-        if child.visit_count == 0:
-            q_value = 0
-        else:
-            q_value = 1 - ((child.value_sum / child.visit_count) + 1) / 2
-        return q_value + self.args['C'] * (math.sqrt(self.visit_count) / (child.visit_count + 1)) * child.prior
-    
-    def expand(self, policy):
-        child=None
-        for action, prob in enumerate(policy):
-
-            if prob > 0:
-                child_state = self.state.copy()
-                child_state = self.game.get_next_state(child_state, action, 1)
-                child_state = self.game.change_perspective(child_state, player=-1)
-
-                child = Node(self.game, self.args, child_state, self, action, prob)
-                self.children.append(child)
-        if(child is None):
-            child_state = self.state.copy()
-            child_state = self.game.change_perspective(child_state, player=-1)
-
-            child = Node(self.game, self.args, child_state, self, action, prob)
-            self.children.append(child)   
-        return child
-            
-    def backpropagate(self, value):
-        self.value_sum += value
-        self.visit_count += 1
-        
-        value = self.game.get_opponent_value(value)
-        if self.parent is not None:
-            self.parent.backpropagate(value)  
-
+from mcts_tree import Tree, predict, evaluate
 
 class MCTS:
-    def __init__(self, game, args, model):
+    #tablebase (atax_tablebase.Tablebase, opcional): as posições que estão na tablebase não são procuradas,
+    #a raiz joga logo a melhor jogada e as folhas usam o valor exato em vez do da rede
+    #(nas posições em que o jogo já acabou o best_action é None e a procura segue sem a tablebase)
+    #cache (eval_cache.EvalCache, opcional): avaliações da rede já feitas, partilhadas entre jogadas
+    def __init__(self, game, args, model, tablebase=None, cache=None):
         self.game = game
         self.args = args
         self.model = model
+        self.tablebase = tablebase
+        self.cache = cache
         
     @torch.no_grad()
     def search(self, state):
+        if self.tablebase is not None:
+            action = self.tablebase.best_action(state)
+            if action is not None:
+                if getattr(self.game, 'canonical_clones', False):
+                    action = self.game.canonical_actions[action]
+                action_probs = np.zeros(self.game.action_size)
+                action_probs[action] = 1
+                return action_probs
         #aqui buscar tabuleiro antigo
-        root = Node(self.game, self.args, state, visit_count=1)
+        #a árvore é um mcts_tree.Tree (arrays com um índice por nó)
+        tree = Tree(self.game, self.args)
+        root = tree.add_root(state, visit_count=1)
         
-        policy, _ = self.model(
-            torch.tensor(self.game.get_encoded_state(state), device=self.model.device).unsqueeze(0)
-        )
-        policy = torch.softmax(policy, axis=1).squeeze(0).cpu().numpy()
+        policy = predict(self.model, self.game, [state], self.cache)[0][0]
         policy = (1 - self.args['dirichlet_epsilon']) * policy + self.args['dirichlet_epsilon'] \
             * np.random.dirichlet([self.args['dirichlet_alpha']] * self.game.action_size)
         #por tabuleiro,dentro tornar em gamestate
 
         
-        valid_moves = self.game.get_valid_moves(root.state,1)
+        valid_moves = self.game.get_valid_moves(state,1)
         policy *= valid_moves
         policy /= np.sum(policy)
-        root.expand(policy)
+        tree.expand(root, policy)
 
         
-        for search in range(self.args['num_searches']):
-            node = root
-            while node.is_fully_expanded():
-                node = node.select()
-            
+        #com leaf_batch_size > 1 as folhas são avaliadas em batches, com virtual loss (ver o mcts_tree)
+        batch_size = self.args.get('leaf_batch_size', 1)
+        search = 0
+        while search < self.args['num_searches']:
+            leaves, states, valid = [], [], []
+            while len(leaves) < batch_size and search < self.args['num_searches']:
+                node = tree.select_leaf(root, virtual_loss=batch_size > 1)
+                search += 1
+                
+                node_state = tree.states[node]
+                value, is_terminal = self.game.get_value_and_terminated(node_state)
+                value = self.game.get_opponent_value(value)
 
-            value, is_terminal = self.game.get_value_and_terminated(node.state)
-            value = self.game.get_opponent_value(value)
+                if not is_terminal and self.tablebase is not None:
+                    known = self.tablebase.lookup(node_state)
+                    if known is not None:
+                        #valor exato na perspetiva do jogador do nó (como o valor da rede); o nó fica como folha
+                        value, is_terminal = known[0], True
 
-            if not is_terminal:
-                policy, value = self.model(
-                    torch.tensor(self.game.get_encoded_state(node.state), device=self.model.device).unsqueeze(0)
-                )
-                policy = torch.softmax(policy, axis=1).squeeze(0).cpu().numpy()
+                if is_terminal or node in leaves:
+                    if batch_size > 1:
+                        tree.revert_virtual_loss(node)
+                    if not is_terminal:
+                        #a folha já está no batch: avalia o batch antes de continuar
+                        search -= 1
+                        break
+                    tree.backpropagate(node, value)
+                    continue
                 
                 #get_valid_moves
-                valid_moves = self.game.get_valid_moves(node.state,1)
-                policy *= valid_moves
-                policy /= np.sum(policy)
-                value = value.item()
-                
-                node.expand(policy)
-                
-            node.backpropagate(value)    
+                leaves.append(node)
+                states.append(node_state)
+                valid.append(self.game.get_valid_moves(node_state,1))
+            
+            if not leaves:
+                continue
+            policies, values = evaluate(self.model, self.game, states, valid, self.cache)
+            for node, policy, value in zip(leaves, policies, values):
+                if batch_size > 1:
+                    tree.revert_virtual_loss(node)
+                tree.expand(node, policy)
+                tree.backpropagate(node, value)
             
             
-        action_probs = np.zeros(self.game.action_size)
-        for child in root.children:
-            action_probs[child.action_taken] = child.visit_count
-        action_probs /= np.sum(action_probs)
-        return action_probs
\ No newline at end of file
+        return tree.action_probs(root)
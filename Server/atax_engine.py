@@ -0,0 +1,277 @@
+import sys
+import time
+import socket
+import numpy as np
+from functools import lru_cache
+import atax
+import atax_tablebase
+from Connect_Ataxx import Atax
+
+# Motor alpha-beta de Ataxx sem interface (substitui o minimax comentado na classe Attax do atax.py).
+# O estado fica nos bitboards do atax (um int por jogador) e as jogadas são feitas e desfeitas no
+# mesmo objeto (make/unmake), em vez de um deepcopy do State por nó.
+# A procura é negamax com alpha-beta, tabela de transposição com hashes de Zobrist, iterative deepening
+# com limite de tempo e ordenação das jogadas pelo número de peças capturadas.
+# O fim do jogo segue as mesmas regras do Connect_Ataxx.Atax.winner.
+# Pode ser usado como adversário para avaliar os modelos ou como agente no server:
+#   python atax_engine.py [tempo por jogada] [host] [port] [ficheiro do layout]
+# No 4x4, se a tablebase (atax_tablebase.py) já tiver sido gerada, as jogadas saem dela sem procura.
+
+WIN = 1000  # valor de uma vitória (menos a profundidade, para preferir as vitórias mais rápidas)
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+# chaves de Zobrist (as mesmas do atax.position_hash) em ints de Python, indexadas pelo índice do bit
+@lru_cache(maxsize=None)
+def zobrist_keys(nb):
+    keys, turn = atax.zobrist_table(nb)
+    return {1: [int(k) for k in keys[0]], -1: [int(k) for k in keys[1]], 'turn': int(turn)}
+
+
+class AtaxEngine:
+    def __init__(self, board, player=1, tablebase=None):
+        board = np.asarray(board)
+        self.nb = len(board)
+        self.blocked = atax.bits_of(board, 8)
+        self.r = atax.rings(self.nb, self.blocked)  # as máscaras já não têm as casas bloqueadas
+        self.full = (1 << self.nb*self.nb) - 1
+        self.pieces = {1: atax.bits_of(board, 1), -1: atax.bits_of(board, -1)}
+        self.player = player
+        self.keys = zobrist_keys(self.nb)
+        self.hash = self.keys['turn'] if player == -1 else 0
+        for p in (1, -1):
+            for s in atax.iter_bits(self.pieces[p]):
+                self.hash ^= self.keys[p][s]
+        self.stack = []
+        self.tt = {}
+        self.nodes = 0
+        self.deadline = None
+        self.tablebase = tablebase
+
+    # tabuleiro na perspetiva do jogador que joga (1 são as peças dele)
+    def neutral_board(self):
+        board = np.zeros(self.nb*self.nb)
+        board[list(atax.iter_bits(self.pieces[self.player]))] = 1
+        board[list(atax.iter_bits(self.pieces[-self.player]))] = -1
+        board[list(atax.iter_bits(self.blocked))] = 8
+        return board.reshape(self.nb, self.nb)
+
+    def empty(self):
+        return self.full & ~(self.pieces[1] | self.pieces[-1] | self.blocked)
+
+    # jogadas (origem, destino) do jogador que joga, com um só clone para cada destino
+    def moves(self):
+        return [(s, t) for s, t, k in atax.move_targets(self.pieces[self.player], self.empty(), self.r, True)]
+
+    def make(self, s, t):
+        p = self.player
+        own, opp = self.pieces[p], self.pieces[-p]
+        flip = self.r.clone[t] & opp
+        jump = self.r.jump[s] >> t & 1
+        self.stack.append((s, t, flip, jump))
+        h = self.hash ^ self.keys['turn'] ^ self.keys[p][t]
+        if jump:
+            h ^= self.keys[p][s]
+        for f in atax.iter_bits(flip):
+            h ^= self.keys[p][f] ^ self.keys[-p][f]
+        self.hash = h
+        self.pieces[p], self.pieces[-p] = atax.play_bits(own, opp, s, t, self.r)
+        self.player = -p
+
+    def unmake(self):
+        s, t, flip, jump = self.stack.pop()
+        self.player = p = -self.player
+        own = self.pieces[p] & ~(flip | (1 << t))
+        if jump:
+            own |= 1 << s
+        self.pieces[p] = own
+        self.pieces[-p] |= flip
+        h = self.hash ^ self.keys['turn'] ^ self.keys[p][t]
+        if jump:
+            h ^= self.keys[p][s]
+        for f in atax.iter_bits(flip):
+            h ^= self.keys[p][f] ^ self.keys[-p][f]
+        self.hash = h
+
+    # vencedor (1, -1 ou 0 para empate) se o jogo acabou, senão None (as regras do Atax.winner)
+    def winner(self):
+        empty = self.empty()
+        n_empty = empty.bit_count()
+        c1, c_1 = self.pieces[1].bit_count(), self.pieces[-1].bit_count()
+        if n_empty == 0:
+            return 0 if c1 == c_1 else (-1 if c1 < c_1 else 1)
+        if c1 == 0:
+            return -1
+        if c_1 == 0:
+            return 1
+        if not atax.has_moves(self.pieces[1], empty, self.r):
+            return -1 if c1 < c_1 + n_empty else 1
+        if not atax.has_moves(self.pieces[-1], empty, self.r):
+            return 1 if c_1 < c1 + n_empty else -1
+        return None
+
+    # diferença de peças na perspetiva do jogador que joga
+    def evaluate(self):
+        return self.pieces[self.player].bit_count() - self.pieces[-self.player].bit_count()
+
+    # jogadas ordenadas: a melhor jogada da tabela primeiro, depois as que capturam mais (o clone conta +1)
+    def ordered_moves(self, best):
+        opp = self.pieces[-self.player]
+        clone = self.r.clone
+        moves = self.moves()
+        moves.sort(key=lambda m: (m != best, -((clone[m[1]] & opp).bit_count() + (clone[m[0]] >> m[1] & 1))))
+        return moves
+
+    def negamax(self, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.deadline is not None and self.nodes & 1023 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+        winner = self.winner()
+        if winner is not None:
+            return 0 if winner == 0 else (WIN - ply) * winner * self.player
+        if depth == 0:
+            return self.evaluate()
+
+        alpha0 = alpha
+        entry = self.tt.get(self.hash)
+        best = None
+        if entry is not None:
+            e_depth, value, flag, best = entry
+            if e_depth >= depth:
+                if flag == EXACT:
+                    return value
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                elif flag == UPPER:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        best_value = -WIN - 1
+        for move in self.ordered_moves(best):
+            self.make(*move)
+            value = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            self.unmake()
+            if value > best_value:
+                best_value, best = value, move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        flag = UPPER if best_value <= alpha0 else (LOWER if best_value >= beta else EXACT)
+        self.tt[self.hash] = (depth, best_value, flag, best)
+        return best_value
+
+    # procura com iterative deepening até acabar o tempo (em segundos) ou chegar a max_depth;
+    # retorna (melhor jogada, valor, profundidade completa) ou (None, valor, 0) se o jogo já acabou
+    def search(self, time_limit=1.0, max_depth=64):
+        winner = self.winner()
+        if winner is not None:
+            return None, winner * self.player * WIN, 0
+        if self.tablebase is not None:
+            board = self.neutral_board()
+            known = self.tablebase.lookup(board)
+            action = self.tablebase.best_action(board) if known is not None else None
+            if action is not None:
+                s = action // 24
+                dx, dy = atax.OFFSETS[action % 24]
+                return (s, s + dx*self.nb + dy), known[0] * (WIN - known[1]), known[1]
+        self.deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        self.nodes = 0
+        if len(self.tt) > 1000000:
+            self.tt.clear()
+        best, best_value, completed = self.ordered_moves(None)[0], 0, 0
+        stack_size = len(self.stack)
+        try:
+            for depth in range(1, max_depth + 1):
+                value = self.negamax(depth, -WIN - 1, WIN + 1, 0)
+                best, best_value, completed = self.tt[self.hash][3], value, depth
+                if abs(value) > WIN - 100:  # resultado já conhecido
+                    break
+        except SearchTimeout:
+            while len(self.stack) > stack_size:
+                self.unmake()
+        finally:
+            self.deadline = None
+        return best, best_value, completed
+
+    # converte (origem, destino) para (xi, yi, xf, yf)
+    def to_move(self, move):
+        s, t = move
+        return s // self.nb, s % self.nb, t // self.nb, t % self.nb
+
+    # converte (origem, destino) para a ação do Connect_Ataxx ((xi*n+yi)*24 + k)
+    def to_action(self, move):
+        xi, yi, xf, yf = self.to_move(move)
+        return move[0]*24 + atax.OFFSETS.index((xf - xi, yf - yi))
+
+    # aplica uma jogada (xi, yi, xf, yf) recebida de fora (por exemplo do server)
+    def play(self, xi, yi, xf, yf):
+        self.make(xi*self.nb + yi, xf*self.nb + yf)
+
+
+# ação do Connect_Ataxx escolhida pelo motor para o jogador player no estado dado (para usar como adversário)
+def best_action(state, player=1, time_limit=1.0, max_depth=64, tablebase=None):
+    engine = AtaxEngine(state, player, tablebase)
+    move, _, _ = engine.search(time_limit, max_depth)
+    return None if move is None else engine.to_action(move)
+
+
+# agente para o server.py: recebe "AG1 A5x5" ou "AG2 A5x5" e joga com o motor; se o server usar um
+# layout, o agente tem de receber o mesmo ficheiro
+def play_on_server(time_limit=1.0, host='localhost', port=12345, layout=None):
+    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client_socket.connect((host, port))
+    response = client_socket.recv(1024).decode()
+    print("Server:", response)
+    me = 1 if response.startswith("AG1") else -1
+    n = int(response.split(" ")[1][1:].split("x")[0])
+    if layout is not None:
+        board = atax.load_layout(layout)
+    else:
+        board = np.zeros((n, n))
+        board[0][0] = board[n-1][n-1] = 1
+        board[0][n-1] = board[n-1][0] = -1
+    engine = AtaxEngine(board, 1, atax_tablebase.load() if n == 4 and layout is None else None)
+    game = Atax(n, layout=board if layout is not None else None)
+
+    while True:
+        if engine.player == me:
+            move, value, depth = engine.search(time_limit)
+            if move is None:
+                break
+            # a jogada enviada passa pelo Atax.get_move, que garante que a origem de um clone é uma peça nossa
+            xi, yi, xf, yf = game.get_move(engine.neutral_board(), engine.to_action(move))
+            client_socket.sendall(f"MOVE {xi},{yi},{xf},{yf}".encode())
+            response = client_socket.recv(1024).decode()
+            print("Send:", (xi, yi, xf, yf), "depth", depth, "value", value, "->", response)
+            if response.startswith("VALID"):
+                engine.make(*move)
+            elif "TURN LOSS" in response:
+                engine.player = -engine.player
+                engine.hash ^= engine.keys['turn']
+        else:
+            response = client_socket.recv(1024).decode()
+            print("Opponent:", response)
+            if not response:
+                break
+            if response.startswith("MOVE"):
+                engine.play(*[int(x) for x in response.split(" ")[1].split(",")[:4]])
+            elif response.startswith("PASS"):
+                engine.player = -engine.player
+                engine.hash ^= engine.keys['turn']
+        if "END" in response:
+            break
+    client_socket.close()
+
+
+if __name__ == "__main__":
+    time_limit = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    host = sys.argv[2] if len(sys.argv) > 2 else 'localhost'
+    port = int(sys.argv[3]) if len(sys.argv) > 3 else 12345
+    layout = sys.argv[4] if len(sys.argv) > 4 else None
+    play_on_server(time_limit, host, port, layout)
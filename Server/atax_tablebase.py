@@ -0,0 +1,236 @@
+import os
+import sys
+import time
+import numpy as np
+import atax
+from Connect_Ataxx import Atax
+
+# Tablebase do Ataxx 4x4: todas as posições alcançáveis a partir do tabuleiro inicial, resolvidas por
+# análise retrógrada (vitória/empate/derrota e número de jogadas até ao fim com jogo perfeito).
+# As posições estão sempre na perspetiva do jogador que joga (como os estados do MCTS, peças dele a 1) e
+# cada uma é um índice em base 3: sum((casa+1) * 3**i). Mudar de perspetiva é 3**(n*n)-1 - índice.
+# A tabela é um array com uma entrada por índice (3**16 ≈ 43M) guardado em .npy e aberto com mmap,
+# por isso consultar uma posição é só ler um byte:
+#   0 - posição não alcançável, 1 - empate, 2+2d - vitória em d jogadas, 3+2d - derrota em d jogadas
+# Para gerar o ficheiro (~2-3 min de CPU, ~2GB de memória):
+#   python atax_tablebase.py [n] [ficheiro]
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ataxx4x4_tablebase.npy")
+CHUNK = 100000
+
+
+# tabelas das jogadas para o cálculo vetorizado dos filhos de muitas posições de uma vez
+class MoveTables:
+    def __init__(self, n):
+        self.n = n
+        self.squares = n*n
+        self.size = 3**self.squares
+        self.powers = 3**np.arange(self.squares, dtype=np.int64)
+        r = atax.rings(n)
+        # ring[t, f]: f é vizinho (distância 1) de t
+        self.ring = np.zeros((self.squares, self.squares), dtype=np.int64)
+        reach = np.zeros((self.squares, self.squares), dtype=np.int8)
+        for t in range(self.squares):
+            self.ring[t, list(atax.iter_bits(r.clone[t]))] = 1
+            reach[t, list(atax.iter_bits(r.reach[t]))] = 1
+        self.reach = reach
+        # saltos (origem, destino); os clones são um por destino, porque a origem não muda a posição
+        self.jump_source = np.array([s for s in range(self.squares) for t in atax.iter_bits(r.jump[s])])
+        self.jump_target = np.array([t for s in range(self.squares) for t in atax.iter_bits(r.jump[s])])
+        # ação do Connect_Ataxx de cada jogada (os clones com a ação canónica do destino)
+        self.actions = np.concatenate([np.array(r.clone_action),
+                                       self.jump_source*24 + [atax.OFFSETS.index((t//n - s//n, t % n - s % n))
+                                                              for s, t in zip(self.jump_source, self.jump_target)]])
+
+    # dígitos (0 adversário, 1 vazia, 2 jogador) de cada índice, (M, n*n)
+    def digits(self, index):
+        d = np.empty((len(index), self.squares), dtype=np.int8)
+        x = np.array(index, dtype=np.int64)
+        for i in range(self.squares):
+            d[:, i] = x % 3
+            x //= 3
+        return d
+
+    # índice de estados (..., n, n) na perspetiva do jogador que joga
+    def index(self, states):
+        states = np.asarray(states).reshape(-1, self.squares)
+        return ((states + 1).astype(np.int64) * self.powers).sum(axis=1)
+
+    # jogadas válidas (M, 16 + saltos) e índice (na perspetiva do adversário) da posição depois de cada uma
+    def moves(self, index):
+        d = self.digits(index)
+        own, opp, empty = d == 2, d == 0, d == 1
+        # infeção: as peças do adversário à volta do destino passam de 0 a 2
+        flips = (opp * (2*self.powers)) @ self.ring.T
+        clone_valid = empty & ((own.astype(np.int8) @ self.ring.T.astype(np.int8)) > 0)
+        jump_valid = own[:, self.jump_source] & empty[:, self.jump_target]
+        valid = np.concatenate([clone_valid, jump_valid], axis=1)
+        delta = np.concatenate([self.powers + flips,
+                                self.powers[self.jump_target] + flips[:, self.jump_target] - self.powers[self.jump_source]],
+                               axis=1)
+        children = (self.size - 1) - (np.asarray(index)[:, None] + delta)
+        return valid, children
+
+    # (terminated, winner) de cada índice com as regras do Atax.winner (winner 1 é o jogador que joga)
+    def terminal(self, index):
+        d = self.digits(index)
+        own, opp, empty = d == 2, d == 0, d == 1
+        n_empty, pieces_1, pieces_m1 = empty.sum(axis=1), own.sum(axis=1), opp.sum(axis=1)
+        has_move_1 = (((own.astype(np.int8) @ self.reach) > 0) & empty).any(axis=1)
+        has_move_m1 = (((opp.astype(np.int8) @ self.reach) > 0) & empty).any(axis=1)
+        conditions = [n_empty == 0, pieces_1 == 0, pieces_m1 == 0, ~has_move_1, ~has_move_m1]
+        choices = [np.sign(pieces_1 - pieces_m1),
+                   -1,
+                   1,
+                   np.where(pieces_1 < pieces_m1 + n_empty, -1, 1),
+                   np.where(pieces_m1 < pieces_1 + n_empty, 1, -1)]
+        return np.any(conditions, axis=0), np.select(conditions, choices, default=0).astype(np.int8)
+
+
+# pesquisa em largura (vetorizada) de todas as posições alcançáveis a partir do tabuleiro inicial
+def reachable_positions(tables, log=print):
+    visited = np.zeros(tables.size, dtype=bool)
+    start = tables.index(Atax(tables.n).get_initial_state())
+    visited[start] = True
+    frontier = start
+    depth = 0
+    while len(frontier):
+        terminated, _ = tables.terminal(frontier)
+        frontier = frontier[~terminated]
+        new = []
+        for c in range(0, len(frontier), CHUNK):
+            valid, children = tables.moves(frontier[c:c+CHUNK])
+            new.append(np.unique(children[valid]))
+        frontier = np.unique(np.concatenate(new)) if new else np.zeros(0, dtype=np.int64)
+        frontier = frontier[~visited[frontier]]
+        visited[frontier] = True
+        depth += 1
+        log("profundidade %d: %d posições novas" % (depth, len(frontier)))
+    return np.flatnonzero(visited)
+
+
+# análise retrógrada; retorna o código de cada posição (ver o início do ficheiro)
+def solve(tables, positions, log=print):
+    count = len(positions)
+    rank = np.full(tables.size, -1, dtype=np.int32)
+    rank[positions] = np.arange(count, dtype=np.int32)
+
+    terminated = np.zeros(count, dtype=bool)
+    value = np.zeros(count, dtype=np.int8)  # 1 vitória, -1 derrota, 0 empate (do jogador que joga)
+    for c in range(0, count, CHUNK):
+        terminated[c:c+CHUNK], value[c:c+CHUNK] = tables.terminal(positions[c:c+CHUNK])
+    resolved = terminated.copy()
+    distance = np.zeros(count, dtype=np.int32)
+
+    # filhos de cada posição não terminal, em formato CSR (parents, counts, children)
+    parents = np.flatnonzero(~terminated).astype(np.int32)
+    counts, children = [], []
+    for c in range(0, len(parents), CHUNK):
+        valid, child = tables.moves(positions[parents[c:c+CHUNK]])
+        counts.append(valid.sum(axis=1))
+        children.append(rank[child[valid]])
+    counts = np.concatenate(counts)
+    children = np.concatenate(children)
+    del rank
+    log("%d posições, %d terminais, %d jogadas" % (count, terminated.sum(), len(children)))
+
+    # em cada passo d ficam resolvidas as posições com vitória em d (um filho perdido) e as com derrota em d
+    # (todos os filhos ganhos); as que nunca ficam resolvidas são empates (o jogo pode repetir-se para sempre)
+    d = 0
+    while len(parents):
+        d += 1
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        child_resolved = resolved[children]
+        child_value = value[children]
+        any_loss = np.logical_or.reduceat(child_resolved & (child_value == -1), starts)
+        all_win = np.logical_and.reduceat(child_resolved & (child_value == 1), starts)
+        win, loss = parents[any_loss], parents[all_win & ~any_loss]
+        if len(win) + len(loss) == 0:
+            break
+        value[win], value[loss] = 1, -1
+        resolved[win] = resolved[loss] = True
+        distance[win] = distance[loss] = d
+        # só ficam as posições ainda por resolver
+        keep = ~(any_loss | all_win)
+        children = children[np.repeat(keep, counts)]
+        parents, counts = parents[keep], counts[keep]
+        log("passo %d: %d vitórias, %d derrotas, %d por resolver" % (d, len(win), len(loss), len(parents)))
+
+    value[~resolved] = 0
+    codes = np.where(value == 0, 1, 2 + 2*distance + (value == -1))
+    return codes
+
+
+def build(n=4, path=DEFAULT_PATH, log=print):
+    start = time.perf_counter()
+    tables = MoveTables(n)
+    positions = reachable_positions(tables, log)
+    codes = solve(tables, positions, log)
+    dtype = np.uint8 if codes.max() < 256 else np.uint16
+    table = np.zeros(tables.size, dtype=dtype)
+    table[positions] = codes
+    np.save(path, table)
+    log("tablebase guardada em %s (%.0f s)" % (path, time.perf_counter() - start))
+
+
+class Tablebase:
+    def __init__(self, path=DEFAULT_PATH):
+        self.table = np.load(path, mmap_mode='r')
+        self.n = int(round((np.log(len(self.table)) / np.log(3)) ** 0.5))  # a tabela tem 3**(n*n) entradas
+        self.tables = MoveTables(self.n)
+
+    # (value, distance) de um estado na perspetiva do jogador que joga (value 1 vitória, 0 empate, -1 derrota)
+    # ou None se a posição não está na tabela
+    def lookup(self, state):
+        state = np.asarray(state)
+        if state.shape[-1] != self.n or (state == 8).any():
+            return None
+        code = int(self.table[self.tables.index(state)[0]])
+        if code == 0:
+            return None
+        if code == 1:
+            return 0, 0
+        return (1 if code % 2 == 0 else -1), (code - 2) // 2
+
+    # melhor ação do Connect_Ataxx: a vitória mais rápida, senão o empate, senão a derrota mais longa;
+    # None se a posição não está na tabela ou se o jogo já acabou (não há jogadas)
+    def best_action(self, state):
+        known = self.lookup(state)
+        if known is None or (known[0] != 0 and known[1] == 0):
+            return None
+        valid, children = self.tables.moves(self.tables.index(state))
+        moves = np.flatnonzero(valid[0])
+        if not len(moves):
+            return None
+        codes = self.table[children[0, moves]].astype(np.int64)
+        # os códigos dos filhos estão na perspetiva do adversário: a derrota dele é a nossa vitória
+        score = np.where(codes == 1, 0,
+                         np.where(codes % 2 == 1, 10**6 - (codes - 3) // 2, -10**6 + (codes - 2) // 2))
+        move = moves[np.argmax(score)]
+        if move >= self.tables.squares:
+            return int(self.tables.actions[move])
+        # clone: a origem passa a ser uma peça do jogador vizinha do destino (como no Atax.get_move)
+        t = move
+        s = np.flatnonzero(self.tables.ring[t] & (np.asarray(state).ravel() == 1))[0]
+        n = self.n
+        return int(s*24 + atax.OFFSETS.index((t//n - s//n, t % n - s % n)))
+
+    # política com a melhor ação (para o MCTS e para os alvos do treino), ou None como no best_action
+    def policy(self, state):
+        action = self.best_action(state)
+        if action is None:
+            return None
+        policy = np.zeros(self.n*self.n*24)
+        policy[action] = 1
+        return policy
+
+
+# tablebase do ficheiro por omissão, se já tiver sido gerada
+def load(path=DEFAULT_PATH):
+    return Tablebase(path) if os.path.exists(path) else None
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PATH
+    build(n, path)
@@ -0,0 +1,130 @@
+import json
+import time
+import random
+import argparse
+import numpy as np
+import atax
+from Connect_Ataxx import Atax
+from bench_common import time_calls, git_commit, print_table, compare
+
+# Benchmark do Ataxx (atax.State e Connect_Ataxx.Atax):
+#  - perft a partir da posição inicial, comparado com os valores de referência (se os valores mudarem
+#    é porque a geração das jogadas mudou)
+#  - custo por chamada de available_moves, execute_move, get_valid_moves e winner nas posições de jogos
+#    aleatórios com seed fixa
+#  - jogos aleatórios por segundo
+#   python bench_atax.py --json antes.json
+#   python bench_atax.py --json depois.json --compare antes.json
+
+SIZES = [4, 5, 6]
+
+# número de posições do perft à profundidade 1, 2, ... (calculados com a versão original do atax.py,
+# com as ações todas do Connect_Ataxx, sem juntar os clones)
+PERFT_REFERENCE = {
+    4: [16, 176, 2624, 33008, 499760],
+    5: [16, 244, 4760, 95004],
+    6: [16, 256, 6076, 141020],
+}
+
+
+# perft com o Connect_Ataxx: o estado está sempre na perspetiva do jogador que joga
+def perft(game, state, depth):
+    if depth == 0 or game.get_value_and_terminated(state)[1]:
+        return 1
+    nodes = 0
+    for action in np.flatnonzero(game.get_valid_moves(state, 1)):
+        nodes += perft(game, game.change_perspective(game.get_next_state(state, action, 1), -1), depth - 1)
+    return nodes
+
+
+def perft_table(sizes=SIZES, depth=3):
+    results = {}
+    for n in sizes:
+        game = Atax(n)
+        start = time.perf_counter()
+        nodes = perft(game, game.get_initial_state(), depth)
+        elapsed = time.perf_counter() - start
+        reference = PERFT_REFERENCE.get(n, [])
+        expected = reference[depth - 1] if depth <= len(reference) else None
+        if expected is not None and nodes != expected:
+            print("ATENÇÃO: perft %dx%d à profundidade %d deu %d em vez de %d" % (n, n, depth, nodes, expected))
+        results[n] = {"depth": depth, "nodes": nodes, "nodes_per_s": nodes / elapsed,
+                      "ok": expected is None or nodes == expected}
+    return results
+
+
+# joga um jogo aleatório e retorna os estados (na perspetiva do jogador que joga) e as ações
+def sample_game(game, rng):
+    state = game.get_initial_state()
+    states, actions = [], []
+    while not game.get_value_and_terminated(state)[1]:
+        valid = np.flatnonzero(game.get_valid_moves(state, 1))
+        action = valid[rng.randrange(len(valid))]
+        states.append(state)
+        actions.append(action)
+        state = game.change_perspective(game.get_next_state(state, action, 1), -1)
+    return states, actions
+
+
+# converte uma ação do Connect_Ataxx para um atax.Move do jogador 1
+def to_move(game, action):
+    xi, yi = divmod(action // 24, game.column_count)
+    dx, dy = game.num_to_pos[action % 24]
+    move = atax.Move(xi, yi, xi + dx, yi + dy, 1, 0)
+    move.ty = move.movement_type()
+    return move
+
+
+# custo por chamada das funções principais e jogos aleatórios por segundo
+def self_play(sizes=SIZES, num_games=10, seed=0):
+    results = {}
+    for n in sizes:
+        game = Atax(n)
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        games = [sample_game(game, rng) for _ in range(num_games)]
+        elapsed = time.perf_counter() - start
+        states = [s for g in games for s in g[0]]
+        moves = [to_move(game, a) for g in games for a in g[1]]
+        results[n] = {
+            "positions": len(states),
+            "games_per_s": num_games / elapsed,
+            "positions_per_s": len(states) / elapsed,
+            "available_moves_us": time_calls(lambda s: atax.State(s, 1).available_moves(1), [(s,) for s in states]),
+            "execute_move_us": time_calls(lambda s, m: atax.State(s, 1).execute_move(m), zip(states, moves)),
+            "get_valid_moves_us": time_calls(game.get_valid_moves, [(s, 1) for s in states]),
+            "winner_us": time_calls(game.winner, [(s,) for s in states]),
+        }
+    return results
+
+
+def run(sizes=SIZES, depth=3, num_games=10, seed=0):
+    return {
+        "commit": git_commit(),
+        "seed": seed,
+        "perft": perft_table(sizes, depth),
+        "self_play": self_play(sizes, num_games, seed),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do Ataxx")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--depth", type=int, default=3, help="profundidade do perft")
+    parser.add_argument("--games", type=int, default=10, help="número de jogos aleatórios por tamanho")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="ficheiro onde guardar os resultados")
+    parser.add_argument("--compare", help="JSON de um commit anterior para comparar")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.depth, args.games, args.seed)
+    print_table("Perft", results["perft"], width=22)
+    print_table("Jogos aleatórios (us por chamada)", results["self_play"], width=22)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results, ("perft", "self_play"), ignore=("depth", "nodes", "positions", "ok"))
+    if not all(row["ok"] for row in results["perft"].values()):
+        raise SystemExit("perft diferente dos valores de referência")
@@ -0,0 +1,46 @@
+import time
+import subprocess
+
+# Funções partilhadas pelos benchmarks (bench_go.py e bench_atax.py): tempo por chamada, commit atual
+# para o JSON, tabelas dos resultados e comparação com o JSON de um commit anterior.
+
+
+# tempo médio (em microssegundos) de chamar f com cada um dos argumentos
+def time_calls(f, args):
+    args = list(args)
+    start = time.perf_counter()
+    for a in args:
+        f(*a)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+
+# commit atual, para identificar os resultados no JSON
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# tabela com uma linha por tamanho de tabuleiro e uma coluna por valor
+def print_table(title, results, width=28):
+    print(title)
+    columns = list(next(iter(results.values())).keys())
+    print("n".rjust(4) + "".join(c.rjust(width) for c in columns))
+    for n, row in results.items():
+        print(str(n).rjust(4) + "".join(("%.1f" % row[c]).rjust(width) for c in columns))
+    print()
+
+
+# mostra a razão novo/antigo de cada valor das secções indicadas (os tempos em us devem descer, os /s
+# devem subir); os valores de ignore não são medidas e não são comparados
+def compare(old, new, sections, ignore=()):
+    print("comparação com o commit", old.get("commit"))
+    for section in sections:
+        for n, row in new[section].items():
+            old_row = old.get(section, {}).get(str(n), old.get(section, {}).get(n))
+            if old_row is None:
+                continue
+            for key, value in row.items():
+                if key in old_row and old_row[key] and key not in ignore:
+                    print("%-10s %3s %-30s %12.1f -> %12.1f  (x%.2f)" % (section, n, key, old_row[key], value, value / old_row[key]))
@@ -0,0 +1,175 @@
+import json
+import time
+import random
+import argparse
+import numpy as np
+import go
+from go_bitboard import GoEngine
+import bench_common
+from bench_common import time_calls, git_commit, print_table
+
+# Benchmark do motor de Go (go.py e go_bitboard.py):
+#  - custo por chamada de move, check_possible_moves, check_for_captures, get_scores, ... para cada tamanho
+#  - playouts aleatórios com seed fixa (playouts/s e posições/s)
+#  - perft: número de posições até à profundidade k (o pass conta como jogada)
+# Os resultados podem ser guardados em JSON para comparar commits:
+#   python bench_go.py --json antes.json
+#   python bench_go.py --json depois.json --compare antes.json
+
+SIZES = [7, 9, 13, 19]
+
+
+# joga um jogo aleatório (com seed fixa) e retorna os estados e as jogadas feitas em cada um
+def sample_game(n, seed=0, max_moves=None):
+    rng = random.Random(seed)
+    if max_moves is None:
+        max_moves = n*n
+    state = go.GameState(np.zeros((n, n), dtype=int))
+    states, moves = [], []
+    while len(moves) < max_moves and not go.is_game_finished(state):
+        possible_moves = sorted(go.check_possible_moves(state))
+        if not possible_moves:
+            break
+        move = rng.choice(possible_moves)
+        states.append(state)
+        moves.append(move)
+        state = state.move(*move)
+    return states, moves
+
+
+# board com a jogada já feita, antes de processar as capturas (o que o check_for_captures recebe)
+def placed_board(state, move):
+    board = state.board.copy()
+    board[move] = state.turn
+    return board, state.turn
+
+
+# custo por chamada das funções principais do motor para cada tamanho de tabuleiro
+def board_size_scaling(sizes=SIZES, seed=0):
+    results = {}
+    for n in sizes:
+        states, moves = sample_game(n, seed)
+        boards = np.stack([state.board for state in states])
+        engine = GoEngine(np.zeros((n, n), dtype=int))
+        results[n] = {
+            "moves": len(moves),
+            "move_us": time_calls(lambda s, m: s.move(*m), zip(states, moves)),
+            "engine_play_us": time_calls(engine.play, moves),
+            "check_possible_moves_us": time_calls(go.check_possible_moves, [(s,) for s in states]),
+            "legal_moves_mask_us": time_calls(go.legal_moves_mask, [(s,) for s in states]),
+            "check_for_captures_us": time_calls(go.check_for_captures, [placed_board(s, m) for s, m in zip(states, moves)]),
+            "get_scores_us": time_calls(lambda s: s.get_scores(), [(s,) for s in states]),
+            "score_boards_batch_us": time_calls(go.score_boards, [(boards,)]) / len(boards),
+        }
+    return results
+
+
+# playouts aleatórios com o GameState e com o GoEngine (playouts/s e posições/s)
+def playouts(sizes=SIZES, num_playouts=10, seed=0):
+    results = {}
+    for n in sizes:
+        rng = random.Random(seed)
+        positions = 0
+        start = time.perf_counter()
+        for _ in range(num_playouts):
+            state = go.GameState(np.zeros((n, n), dtype=int))
+            while not go.is_game_finished(state):
+                possible_moves = sorted(go.check_possible_moves(state))
+                if possible_moves:
+                    state = state.move(*rng.choice(possible_moves))
+                else:
+                    state = state.pass_turn()
+                positions += 1
+        game_state_time = time.perf_counter() - start
+
+        # mesmo ciclo que o random_playout, mas a contar as posições
+        rng = random.Random(seed)
+        engine = GoEngine(np.zeros((n, n), dtype=int))
+        engine_positions = 0
+        start = time.perf_counter()
+        for _ in range(num_playouts):
+            played = 0
+            while not go.is_game_finished(engine):
+                moves = engine.legal_moves()
+                if moves:
+                    engine.play(*rng.choice(moves))
+                else:
+                    engine.pass_turn()
+                played += 1
+            engine.get_winner_model()
+            for _ in range(played):
+                engine.undo()
+            engine_positions += played
+        engine_time = time.perf_counter() - start
+
+        results[n] = {
+            "game_state_playouts_per_s": num_playouts / game_state_time,
+            "game_state_positions_per_s": positions / game_state_time,
+            "engine_playouts_per_s": num_playouts / engine_time,
+            "engine_positions_per_s": engine_positions / engine_time,
+        }
+    return results
+
+
+# perft: número de posições à profundidade depth (jogadas válidas mais o pass; dois pass seguidos acabam o jogo)
+def perft(state, depth):
+    if depth == 0 or go.is_game_finished(state):
+        return 1
+    possible_moves = go.check_possible_moves(state)
+    if depth == 1:
+        return len(possible_moves) + 1
+    nodes = perft(state.pass_turn(), depth - 1)
+    for move in possible_moves:
+        nodes += perft(state.move(*move), depth - 1)
+    return nodes
+
+
+def perft_table(sizes=SIZES, depth=2):
+    results = {}
+    for n in sizes:
+        start = time.perf_counter()
+        nodes = perft(go.GameState(np.zeros((n, n), dtype=int)), depth)
+        elapsed = time.perf_counter() - start
+        results[n] = {"depth": depth, "nodes": nodes, "nodes_per_s": nodes / elapsed}
+    return results
+
+
+def run(sizes=SIZES, depth=2, num_playouts=10, seed=0):
+    return {
+        "commit": git_commit(),
+        "seed": seed,
+        "scaling": board_size_scaling(sizes, seed),
+        "playouts": playouts(sizes, num_playouts, seed),
+        "perft": perft_table(sizes, depth),
+    }
+
+
+# compara com o JSON de um commit anterior e avisa se o perft mudou (a geração das jogadas mudou)
+def compare(old, new):
+    bench_common.compare(old, new, ("scaling", "playouts", "perft"), ignore=("moves", "depth"))
+    for n, row in new["perft"].items():
+        old_row = old.get("perft", {}).get(str(n), old.get("perft", {}).get(n))
+        if old_row is not None and old_row.get("nodes") != row["nodes"] and old_row.get("depth") == row["depth"]:
+            print("ATENÇÃO: perft diferente em %sx%s: %s -> %s" % (n, n, old_row["nodes"], row["nodes"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do motor de Go")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[7, 9, 13])
+    parser.add_argument("--depth", type=int, default=2, help="profundidade do perft")
+    parser.add_argument("--playouts", type=int, default=10, help="número de playouts por tamanho")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="ficheiro onde guardar os resultados")
+    parser.add_argument("--compare", help="JSON de um commit anterior para comparar")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.depth, args.playouts, args.seed)
+    print_table("Custo por chamada (us)", results["scaling"])
+    print_table("Playouts aleatórios", results["playouts"])
+    print_table("Perft", results["perft"])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+import numpy as np
+
+# Cache LRU das avaliações da rede (política já com softmax e valor) para o MCTS, com um limite de memória.
+# A chave é o estado codificado (o que a rede vê, com 1 bit por plano e posição) mais o jogador que joga
+# (state.turn nos estados que o têm, 1 nos arrays neutros), por isso serve para o Connect2Game, para o
+# StatefulConnect2Game e para o Connect_Ataxx.Atax. As jogadas válidas não fazem parte da chave: a máscara
+# é aplicada depois, em cada nó (no Go a mesma posição pode ter jogadas diferentes por causa do superko).
+# Um mesmo cache pode ser passado ao MCTS e usado em todas as jogadas de um jogo.
+#   cache = EvalCache(max_mb=64)
+#   mcts = MCTS(game, args, model, cache=cache)
+#   ...
+#   print(cache.stats())
+class EvalCache:
+    ENTRY_OVERHEAD = 200 # bytes aproximados de cada entrada além da política e da chave (dict, tuplo, float)
+
+    def __init__(self, max_mb=64):
+        self.max_bytes = int(max_mb * 2**20)
+        self.entries = OrderedDict() # chave -> (política, valor), da menos para a mais usada
+        self.nbytes = 0 # memória aproximada ocupada pelas entradas
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    # chave de um estado a partir da sua codificação (get_encoded_state)
+    def key(self, encoded, state):
+        turn = getattr(state, 'turn', 1)
+        return np.packbits(np.asarray(encoded) != 0).tobytes() + bytes([turn & 0xff])
+
+    # (política, valor) guardados para a chave, ou None
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, policy, value):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return
+        policy = np.array(policy)
+        self.entries[key] = (policy, value)
+        self.nbytes += policy.nbytes + len(key) + self.ENTRY_OVERHEAD
+        while self.nbytes > self.max_bytes and self.entries:
+            old_key, (old_policy, _) = self.entries.popitem(last=False)
+            self.nbytes -= old_policy.nbytes + len(old_key) + self.ENTRY_OVERHEAD
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {"entries": len(self.entries), "mb": self.nbytes / 2**20, "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hit_rate(), "evictions": self.evictions}
@@ -0,0 +1,415 @@
+import numpy as np
+from functools import lru_cache
+from go import KOMI, is_game_finished, zobrist_table, history_of
+
+# Motor de Go com bitboards: cada cor é guardada num int de Python, em que o bit
+# i*(n+1)+j representa a posição (i,j). A coluna extra (j == n) nunca tem peças e
+# serve de separador, para que os shifts à esquerda/direita não passem de uma
+# linha para a outra.
+# A API é a mesma do go.GameState (move, pass_turn, get_scores, ...), por isso
+# pode ser usado no lugar dele pelo Connect2Game, pelo server e pela interface.
+
+
+class Geometry:
+    def __init__(self, n):
+        self.n = n
+        self.stride = n + 1 # largura de cada linha em bits (com o separador)
+        self.n_bits = n * self.stride
+        self.n_bytes = (self.n_bits + 7) // 8
+        # máscara com todas as posições válidas do tabuleiro
+        self.mask = 0
+        for i in range(n):
+            for j in range(n):
+                self.mask |= 1 << (i * self.stride + j)
+        # bit de cada posição (i,j)
+        self.bit = [[1 << (i * self.stride + j) for j in range(n)] for i in range(n)]
+        # chaves de Zobrist (as mesmas do go.GameState) indexadas pelo índice do bit
+        keys = zobrist_table(n)
+        self.zobrist = {1: [0] * self.n_bits, -1: [0] * self.n_bits}
+        for i in range(n):
+            for j in range(n):
+                self.zobrist[1][i * self.stride + j] = int(keys[1][i][j])
+                self.zobrist[-1][i * self.stride + j] = int(keys[-1][i][j])
+
+
+# a geometria só depende do tamanho, por isso é calculada uma vez por tamanho
+@lru_cache(maxsize=None)
+def geometry(n):
+    return Geometry(n)
+
+
+# retorna as posições adjacentes (cima, baixo, esquerda, direita) das posições em bits
+def neighbours(bits, geo):
+    s = geo.stride
+    return ((bits << 1) | (bits >> 1) | (bits << s) | (bits >> s)) & geo.mask
+
+
+# retorna o grupo (dentro de own) que contém as posições de seed
+def group(seed, own, geo):
+    g = seed
+    frontier = seed
+    while frontier:
+        new = neighbours(frontier, geo) & own & ~g
+        g |= new
+        frontier = new
+    return g
+
+
+# remove os grupos de opp adjacentes a p que ficaram sem liberdades
+def captures(p, own, opp, geo):
+    empty = geo.mask & ~(own | opp)
+    captured = 0
+    adjacent = neighbours(p, geo) & opp
+    while adjacent:
+        seed = adjacent & -adjacent
+        g = group(seed, opp, geo)
+        adjacent &= ~g
+        if not (neighbours(g, geo) & empty):
+            captured |= g
+    return captured
+
+
+# retorna o XOR das chaves de Zobrist das posições em bits, para a cor color
+def zobrist_bits(bits, color, geo):
+    keys = geo.zobrist[color]
+    h = 0
+    while bits:
+        low = bits & -bits
+        h ^= keys[low.bit_length() - 1]
+        bits ^= low
+    return h
+
+
+# converte um tabuleiro numpy para os bitboards (pretas, brancas)
+def from_array(board, geo):
+    padded = np.zeros((geo.n, geo.stride), dtype=bool)
+    board = np.asarray(board)
+    padded[:, :geo.n] = board == 1
+    black = int.from_bytes(np.packbits(padded.ravel(), bitorder='little').tobytes(), 'little')
+    padded[:, :geo.n] = board == -1
+    white = int.from_bytes(np.packbits(padded.ravel(), bitorder='little').tobytes(), 'little')
+    return black, white
+
+
+# converte um bitboard para um array numpy (n,n) de 0 e 1
+def unpack(bits, geo):
+    raw = np.frombuffer(bits.to_bytes(geo.n_bytes, 'little'), dtype=np.uint8)
+    plane = np.unpackbits(raw, bitorder='little')[:geo.n_bits]
+    return plane.reshape(geo.n, geo.stride)[:, :geo.n]
+
+
+# converte os bitboards (pretas, brancas) para um tabuleiro numpy
+def to_array(black, white, geo, dtype=int):
+    board = unpack(black, geo).astype(dtype)
+    board -= unpack(white, geo).astype(dtype)
+    return board
+
+
+# Parte comum aos estados com bitboards: conversão para numpy e contagem dos scores.
+# As subclasses têm de definir geo, n, black, white, turn, play_idx e pass_count.
+class BitBoard:
+    __slots__ = () # para as subclasses com __slots__ (NodeState) não terem __dict__
+    # tabuleiro em formato numpy (para desenhar e para a rede)
+    @property
+    def board(self):
+        return to_array(self.black, self.white, self.geo)
+
+    # retorna (peças do jogador atual, peças do adversário)
+    def _sides(self):
+        if self.turn == 1:
+            return self.black, self.white
+        return self.white, self.black
+
+    # retorna o vencedor e os scores
+    def get_winner(self):
+        scores = self.get_scores()
+        if scores[1] == scores[-1]:
+            return 0, scores # empate
+        elif scores[1] > scores[-1]:
+            return 1, scores # peças pretas ganham
+        else:
+            return 2, scores # peças brancas ganham
+
+    # função auxiliar para o modelo para retornar o vencedor
+    def get_winner_model(self):
+        winner, scores = self.get_winner()
+        if winner == 2:
+            winner = -1
+        return winner, scores
+
+    # retorna o score de cada jogador
+    def get_scores(self):
+        if self.play_idx == 0:
+            captured_territories = {1:0, -1:0} # se não houve jogadas, não há territórios capturados
+        else:
+            captured_territories = self.captured_territories_count()
+        n_stones = self.get_number_of_stones()
+        return {1: captured_territories[1] + n_stones[1],
+                -1: captured_territories[-1] + n_stones[-1] + KOMI}
+
+    # retorna o número de peças de cada jogador no tabuleiro
+    def get_number_of_stones(self):
+        return {1: self.black.bit_count(), -1: self.white.bit_count()}
+
+    # retorna o número de territórios capturados por cada jogador
+    def captured_territories_count(self):
+        geo = self.geo
+        ct_count = {1: 0, -1: 0}
+        all_empty = geo.mask & ~(self.black | self.white)
+        remaining = all_empty
+        while remaining:
+            # cada região vazia é preenchida de uma vez
+            region = group(remaining & -remaining, all_empty, geo)
+            remaining &= ~region
+            border = neighbours(region, geo)
+            touches_black = border & self.black
+            touches_white = border & self.white
+            if touches_black and not touches_white:
+                ct_count[1] += region.bit_count()
+            elif touches_white and not touches_black:
+                ct_count[-1] += region.bit_count()
+        return ct_count
+
+    # retorna o vencedor e os scores e termina o jogo
+    def end_game(self):
+        self.end = 1
+        self.winner, self.scores = self.get_winner()
+        return self.winner, self.scores
+
+    def get_value_and_terminated(self, state):
+        if is_game_finished(state):
+            return 1, True
+        return 0, False
+
+
+# Motor mutável para pesquisa e playouts: play/pass_turn alteram o estado no lugar e guardam
+# só o que mudou (peça jogada, peças capturadas, hash e contador de pass), e undo desfaz a
+# última jogada. Usa superko posicional com os hashes de Zobrist, como o go.GameState.
+class GoEngine(BitBoard):
+    def __init__(self, board, turn=1, play_idx=0, pass_count=0):
+        self.geo = geometry(len(board))
+        self.n = self.geo.n # tamanho do board
+        self.black, self.white = from_array(board, self.geo) # peças de cada jogador
+        self.turn = turn # vez do jogador
+        self.play_idx = play_idx # número de jogadas feitas
+        self.pass_count = pass_count # número de pass feitos
+        self.hash = zobrist_bits(self.black, 1, self.geo) ^ zobrist_bits(self.white, -1, self.geo)
+        self.seen = {self.hash: 1} # número de vezes que cada posição apareceu no jogo
+        self.stack = [] # jogadas feitas, para o undo
+        self.end = 0 # flag que indica se o jogo acabou
+
+    # verifica se a jogada (i,j) é válida (posição vazia, sem suicídio e sem superko)
+    def is_legal(self, i, j):
+        if not (0 <= i < self.n and 0 <= j < self.n):
+            return False
+        return self._is_legal_bit(self.geo.bit[i][j])
+
+    def _is_legal_bit(self, p):
+        geo = self.geo
+        own, opp = self._sides()
+        if (own | opp) & p:
+            return False
+        adjacent = neighbours(p, geo)
+        captured = captures(p, own | p, opp, geo) if adjacent & opp else 0
+        if not captured and not (adjacent & geo.mask & ~(own | opp)):
+            # sem liberdades diretas nem capturas, só é válida se ligar a um grupo com outra liberdade
+            own |= p
+            if not (neighbours(group(p, own, geo), geo) & geo.mask & ~(own | opp)):
+                return False
+        new_hash = self.hash ^ geo.zobrist[self.turn][p.bit_length() - 1]
+        if captured:
+            new_hash ^= zobrist_bits(captured, -self.turn, geo)
+        return new_hash not in self.seen
+
+    # retorna os bits das jogadas válidas; em vez de testar cada posição, percorre cada grupo
+    # uma vez: as liberdades de um grupo amigo com 2 ou mais liberdades e a última liberdade
+    # de um grupo adversário (captura) nunca são suicídio
+    def legal_bits(self):
+        geo = self.geo
+        own, opp = self._sides()
+        empty = geo.mask & ~(own | opp)
+        safe = empty & neighbours(empty, geo)
+        remaining = own
+        while remaining:
+            g = group(remaining & -remaining, own, geo)
+            remaining &= ~g
+            libs = neighbours(g, geo) & empty
+            if libs & (libs - 1): # mais de uma liberdade
+                safe |= libs
+        capture_hash = {}
+        remaining = opp
+        while remaining:
+            g = group(remaining & -remaining, opp, geo)
+            remaining &= ~g
+            libs = neighbours(g, geo) & empty
+            if not (libs & (libs - 1)): # só uma liberdade: jogar lá captura o grupo
+                safe |= libs
+                capture_hash[libs] = capture_hash.get(libs, 0) ^ zobrist_bits(g, -self.turn, geo)
+        # superko: retira as jogadas que repetem uma posição do jogo
+        keys = geo.zobrist[self.turn]
+        legal = safe
+        while safe:
+            p = safe & -safe
+            safe ^= p
+            if self.hash ^ keys[p.bit_length() - 1] ^ capture_hash.get(p, 0) in self.seen:
+                legal ^= p
+        return legal
+
+    # retorna a lista de jogadas válidas (i,j)
+    def legal_moves(self):
+        stride = self.geo.stride
+        moves = []
+        legal = self.legal_bits()
+        while legal:
+            p = legal & -legal
+            legal ^= p
+            moves.append(divmod(p.bit_length() - 1, stride))
+        return moves
+
+    # retorna a legalidade das n*n+1 ações (a última é o pass), como go.legal_moves_mask
+    def legal_mask(self):
+        mask = np.ones(self.n * self.n + 1, dtype=bool)
+        mask[:-1] = unpack(self.legal_bits(), self.geo).ravel()
+        return mask
+
+    # faz a jogada (i,j) no próprio estado
+    def play(self, i, j):
+        geo = self.geo
+        p = geo.bit[i][j]
+        own, opp = self._sides()
+        captured = captures(p, own | p, opp, geo) # processa as capturas
+        new_hash = self.hash ^ geo.zobrist[self.turn][p.bit_length() - 1]
+        if captured:
+            new_hash ^= zobrist_bits(captured, -self.turn, geo)
+        self.stack.append((p, captured, self.pass_count, self.hash))
+        if self.turn == 1:
+            self.black |= p
+            self.white &= ~captured
+        else:
+            self.white |= p
+            self.black &= ~captured
+        self.hash = new_hash
+        self.seen[new_hash] = self.seen.get(new_hash, 0) + 1
+        self.turn = -self.turn
+        self.play_idx += 1
+        self.pass_count = 0
+
+    # passa a vez no próprio estado
+    def pass_turn(self):
+        self.stack.append((0, 0, self.pass_count, self.hash))
+        self.turn = -self.turn
+        self.play_idx += 1
+        self.pass_count += 1
+
+    # desfaz a última jogada ou pass
+    def undo(self):
+        p, captured, pass_count, old_hash = self.stack.pop()
+        self.turn = -self.turn
+        self.play_idx -= 1
+        self.pass_count = pass_count
+        if p:
+            self.seen[self.hash] -= 1
+            if not self.seen[self.hash]:
+                del self.seen[self.hash]
+            if self.turn == 1:
+                self.black &= ~p
+                self.white |= captured
+            else:
+                self.white &= ~p
+                self.black |= captured
+        self.hash = old_hash
+
+
+# Estado imutável para os nós do MCTS (Connect2Game.StatefulConnect2Game): move e pass_turn criam um
+# estado novo, com o hash de Zobrist atualizado só com o que mudou, e cada estado guarda o go.History
+# das posições do jogo até ele (superko, partilhado com os estados anteriores) e o contador de pass. A legalidade das jogadas é
+# a do GoEngine (o seen só é usado para testar se um hash já apareceu).
+class NodeState(BitBoard):
+    # com __slots__ cada nó ocupa menos memória
+    __slots__ = ('geo', 'n', 'black', 'white', 'turn', 'play_idx', 'pass_count', 'hash', 'seen', 'end', 'winner', 'scores')
+
+    # previous_boards são tabuleiros anteriores do jogo (por exemplo o do client), que contam para o superko
+    def __init__(self, board, turn=1, play_idx=0, pass_count=0, previous_boards=None):
+        geo = geometry(len(board))
+        black, white = from_array(board, geo)
+        h = zobrist_bits(black, 1, geo) ^ zobrist_bits(white, -1, geo)
+        seen = []
+        for b in (previous_boards or {}).values():
+            if b is not None:
+                previous_black, previous_white = from_array(b, geo)
+                seen.append(zobrist_bits(previous_black, 1, geo) ^ zobrist_bits(previous_white, -1, geo))
+        self._set(geo, black, white, turn, play_idx, pass_count, h, history_of(seen + [h]))
+
+    def _set(self, geo, black, white, turn, play_idx, pass_count, hash, seen):
+        self.geo = geo
+        self.n = geo.n # tamanho do board
+        self.black = black # peças do jogador 1
+        self.white = white # peças do jogador -1
+        self.turn = turn # vez do jogador
+        self.play_idx = play_idx # número de jogadas feitas
+        self.pass_count = pass_count # número de pass seguidos
+        self.hash = hash # hash de Zobrist do board
+        self.seen = seen # go.History com os hashes das posições do jogo
+        self.end = 0 # flag que indica se o jogo acabou
+
+    def _next(self, black, white, pass_count, hash, seen):
+        state = NodeState.__new__(NodeState)
+        state._set(self.geo, black, white, -self.turn, self.play_idx + 1, pass_count, hash, seen)
+        return state
+
+    is_legal = GoEngine.is_legal
+    _is_legal_bit = GoEngine._is_legal_bit
+    legal_bits = GoEngine.legal_bits
+    legal_moves = GoEngine.legal_moves
+    legal_mask = GoEngine.legal_mask
+
+    # faz uma jogada na posição (i,j)
+    def move(self, i, j):
+        geo = self.geo
+        p = geo.bit[i][j]
+        own, opp = self._sides()
+        captured = captures(p, own | p, opp, geo) # processa as capturas
+        new_hash = self.hash ^ geo.zobrist[self.turn][p.bit_length() - 1]
+        if captured:
+            new_hash ^= zobrist_bits(captured, -self.turn, geo)
+        own, opp = own | p, opp & ~captured
+        black, white = (own, opp) if self.turn == 1 else (opp, own)
+        return self._next(black, white, 0, new_hash, self.seen.add(new_hash))
+
+    # função para passar a vez
+    def pass_turn(self):
+        return self._next(self.black, self.white, self.pass_count + 1, self.hash, self.seen)
+
+    # estado depois da jogada (i,j), como o go.GameState.get_next_state
+    def get_next_state(self, i, j):
+        return self.move(i, j)
+
+    # retorna o set de jogadas válidas, como go.check_possible_moves
+    def check_possible_moves(self):
+        return set(self.legal_moves())
+
+    # os estados nunca são alterados, por isso a cópia é o próprio estado
+    def copy(self):
+        return self
+
+
+# Nome antigo do estado imutável com bitboards. Tinha a regra de ko simples (só o board anterior do
+# jogador); agora é o NodeState, com o superko posicional como o go.GameState e o GoEngine.
+BitGameState = NodeState
+
+
+# joga aleatoriamente até ao fim do jogo e retorna o vencedor (1, -1 ou 0), deixando o
+# motor como estava
+def random_playout(engine, rng, max_moves=None):
+    played = 0
+    while not is_game_finished(engine) and (max_moves is None or played < max_moves):
+        moves = engine.legal_moves()
+        if moves:
+            engine.play(*rng.choice(moves))
+        else:
+            engine.pass_turn()
+        played += 1
+    winner, _ = engine.get_winner_model()
+    for _ in range(played):
+        engine.undo()
+    return winner
@@ -0,0 +1,161 @@
+import math
+import numpy as np
+import torch
+
+# Árvore do MCTS guardada em arrays (struct of arrays), com um índice por nó em vez de um objeto por nó:
+# visitas, soma dos valores, prior, pai, ação e o bloco de filhos de cada nó. Os filhos de um nó são
+# criados todos juntos no expand, por isso ficam seguidos (first_child ... first_child+child_count-1) e
+# a seleção PUCT é um argmax vetorizado sobre esse bloco. O backpropagate sobe pelos índices dos pais.
+# Os arrays crescem para o dobro quando enchem. A raiz é sempre o nó 0.
+# Os filhos são criados só com a ação e o prior: o estado de cada um (states) fica None até o select o
+# escolher pela primeira vez, porque a maior parte dos filhos nunca chega a ser visitada.
+# Com leaf_batch_size > 1 o MCTS.search junta várias folhas antes de chamar a rede: cada descida põe uma
+# virtual loss nos nós do caminho (uma visita com valor 1 para o jogador do nó, ou seja uma derrota para
+# quem o escolheu), para as descidas seguintes do mesmo batch irem por outros caminhos, e a virtual loss
+# é retirada antes do backpropagate com o valor verdadeiro.
+# É usada pelo MCTS.py (Go) e pelo MCTS_atax.py (Ataxx).
+class Tree:
+    def __init__(self, game, args, capacity=1024):
+        self.game = game
+        self.args = args
+        self.size = 0 # número de nós
+        self.visit_count = np.zeros(capacity, dtype=np.int64)
+        self.value_sum = np.zeros(capacity)
+        self.prior = np.zeros(capacity)
+        self.parent = np.full(capacity, -1, dtype=np.int64)
+        self.action_taken = np.full(capacity, -1, dtype=np.int64)
+        self.first_child = np.full(capacity, -1, dtype=np.int64)
+        self.child_count = np.zeros(capacity, dtype=np.int64)
+        self.states = [None] * capacity
+
+    # aumenta os arrays para caberem pelo menos size nós
+    def _reserve(self, size):
+        capacity = len(self.visit_count)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name in ('visit_count', 'value_sum', 'prior', 'parent', 'action_taken', 'first_child', 'child_count'):
+            old = getattr(self, name)
+            new = np.full(capacity, -1 if name in ('parent', 'action_taken', 'first_child') else 0, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self.states.extend([None] * (capacity - len(self.states)))
+
+    def add_root(self, state, visit_count=1):
+        self._reserve(1)
+        self.size = 1
+        self.states[0] = state
+        self.visit_count[0] = visit_count
+        return 0
+
+    def is_fully_expanded(self, node):
+        return self.child_count[node] > 0
+
+    # filho com o maior PUCT (o primeiro em caso de empate)
+    def select(self, node):
+        first = self.first_child[node]
+        children = slice(first, first + self.child_count[node])
+        visits = self.visit_count[children]
+        q_value = np.where(visits == 0, 0, 1 - ((self.value_sum[children] / np.maximum(visits, 1)) + 1) / 2)
+        ucb = q_value + self.args['C'] * (math.sqrt(self.visit_count[node]) / (visits + 1)) * self.prior[children]
+        child = first + int(np.argmax(ucb))
+        if self.states[child] is None:
+            self.materialize(child)
+        return child
+
+    # calcula o estado do nó a partir do estado do pai
+    def materialize(self, node):
+        child_state = self.states[self.parent[node]].copy()
+        child_state = self.game.get_next_state(child_state, int(self.action_taken[node]), 1)
+        self.states[node] = self.game.change_perspective(child_state, player=-1)
+        return self.states[node]
+
+    # cria os filhos das ações com prior > 0 (sem estado); se não houver nenhuma, o nó fica com um filho
+    # que passa a vez (a última ação, com o estado na perspetiva do adversário). Retorna o índice do último filho
+    def expand(self, node, policy):
+        actions = np.flatnonzero(policy > 0)
+        passes = not len(actions)
+        if passes:
+            actions, priors = np.array([self.game.action_size - 1]), policy[-1:]
+        else:
+            priors = policy[actions]
+        first, count = self.size, len(actions)
+        self._reserve(first + count)
+        self.size += count
+        children = slice(first, first + count)
+        self.prior[children] = priors
+        self.parent[children] = node
+        self.action_taken[children] = actions
+        self.first_child[node] = first
+        self.child_count[node] = count
+        if passes:
+            self.states[first] = self.game.change_perspective(self.states[node].copy(), player=-1)
+        return first + count - 1
+
+    # desce a partir de node até uma folha (um nó sem filhos), com virtual loss em todos os nós do caminho
+    def select_leaf(self, node=0, virtual_loss=False):
+        if virtual_loss:
+            self.visit_count[node] += 1
+            self.value_sum[node] += 1
+        while self.is_fully_expanded(node):
+            node = self.select(node)
+            if virtual_loss:
+                self.visit_count[node] += 1
+                self.value_sum[node] += 1
+        return node
+
+    # retira a virtual loss do select_leaf do nó e dos antecessores
+    def revert_virtual_loss(self, node):
+        while node >= 0:
+            self.visit_count[node] -= 1
+            self.value_sum[node] -= 1
+            node = self.parent[node]
+
+    # soma o valor ao nó e aos antecessores, trocando de perspetiva em cada nível
+    def backpropagate(self, node, value):
+        while node >= 0:
+            self.value_sum[node] += value
+            self.visit_count[node] += 1
+            value = self.game.get_opponent_value(value)
+            node = self.parent[node]
+
+    # distribuição das visitas pelas ações dos filhos do nó
+    def action_probs(self, node=0):
+        first = self.first_child[node]
+        children = slice(first, first + self.child_count[node])
+        action_probs = np.zeros(self.game.action_size)
+        action_probs[self.action_taken[children]] = self.visit_count[children]
+        action_probs /= np.sum(action_probs)
+        return action_probs
+
+
+# políticas (softmax) num array (N, action_size) e lista dos N valores da rede para um batch de estados,
+# com uma só chamada ao modelo; com um eval_cache.EvalCache só os estados que não estão no cache vão à rede
+def predict(model, game, states, cache=None):
+    encoded = np.stack([game.get_encoded_state(state) for state in states])
+    if cache is None:
+        return forward(model, encoded)
+    keys = [cache.key(e, state) for e, state in zip(encoded, states)]
+    results = [cache.get(key) for key in keys]
+    missing = [k for k, result in enumerate(results) if result is None]
+    if missing:
+        policy, value = forward(model, encoded[missing])
+        for k, p, v in zip(missing, policy, value):
+            cache.put(keys[k], p, v)
+            results[k] = (p, v)
+    return np.stack([p for p, _ in results]), [v for _, v in results]
+
+
+def forward(model, encoded):
+    policy, value = model(torch.tensor(encoded, device=model.device))
+    return torch.softmax(policy, axis=1).cpu().numpy(), value.reshape(-1).tolist()
+
+
+# avalia um batch de estados como o predict; retorna as políticas só com as jogadas de valid_moves e
+# normalizadas, num array (N, action_size), e a lista dos N valores
+def evaluate(model, game, states, valid_moves, cache=None):
+    policy, value = predict(model, game, states, cache)
+    policy *= np.asarray(valid_moves)
+    policy /= np.sum(policy, axis=1, keepdims=True)
+    return policy, value
@@ -1,6 +1,8 @@
+import sys
 import socket
 import time
 from go import *
+from go_bitboard import GoEngine
 import numpy as np 
 from Connect_Ataxx import Atax as Atax
 import pygame
@@ -8,15 +10,29 @@ from atax import *
 
 
 # Escolha do board para o jogo
-Games = ["G7x7", "G9x9", "A4x4", "A5x5", "A6x6"]
-number = int(input("Escolha o jogo: \n Go: 1- G7x7  2- G9x9 \n Ataxx: 3- A4x4  4- A5x5  5- A6x6 \n"))
+Games = ["G7x7", "G9x9", "G13x13", "G19x19", "A4x4", "A5x5", "A6x6", "A7x7"]
+number = int(input("Escolha o jogo: \n Go: 1- G7x7  2- G9x9  3- G13x13  4- G19x19 \n Ataxx: 5- A4x4  6- A5x5  7- A6x6  8- A7x7 \n"))
 Game = Games[number-1]
 
-# Função para obter o tamanho do board
+# Layout opcional para o Ataxx (ficheiro com 0, 1, 2 e 8 nas casas bloqueadas), ex: python server.py board.txt
+# O tamanho do jogo passa a ser o do layout; os agentes têm de usar o mesmo ficheiro
+LAYOUT = load_layout(sys.argv[1]) if len(sys.argv) > 1 and Game[0] == "A" else None
+if LAYOUT is not None:
+    Game = "A%dx%d" % (len(LAYOUT), len(LAYOUT))
+
+# Número máximo de jogadas de um jogo de Ataxx (com os saltos o jogo pode não acabar); ao chegar ao limite
+# ou com 3 repetições da mesma posição ganha quem tiver mais peças
+ATAXX_MAX_PLIES = 400
+
+# Função para obter o tamanho do board (ex: "G13x13" -> 13)
 def n_board(Game):
-    n = int(Game[1])
+    n = int(Game[1:].split("x")[0])
     return n
 
+# Função para extrair as coordenadas de uma jogada (ex: "MOVE 12,3" -> [12, 3])
+def parse_move(data):
+    return [int(x) for x in data.split(" ")[1].split(",")]
+
 # Configuração do server
 def server_for_go(host='localhost', port=12345):
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -36,7 +52,7 @@ def server_for_go(host='localhost', port=12345):
     print("------------------------------------")
     n = n_board(Game)
     initial_board = np.zeros((n, n),dtype=int)  # Tabuleiro inicial
-    Go = GameState(initial_board)   # Jogo iniciado
+    Go = GoEngine(initial_board)   # Jogo iniciado
 
     # Interface gráfica
     pygame.init()
@@ -66,7 +82,7 @@ def server_for_go(host='localhost', port=12345):
                 
                 agents[current_agent].sendall(b'VALID') # Envia a mensagem de validação
                 agents[1-current_agent].sendall(data.encode()) # Envia a jogada para o outro agente
-                Go = Go.pass_turn() # Executa o pass_turn
+                Go.pass_turn() # Executa o pass_turn
                 
                 if current_agent == 0:
                     print("Agent 1 -> ",data)
@@ -74,8 +90,7 @@ def server_for_go(host='localhost', port=12345):
                     print("Agent 2 -> ",data)
             else:
                 # Processing the move (example: "MOVE X,Y")
-                i = int(data[5])
-                j = int(data[7])
+                i, j = parse_move(data)
                 
                 if current_agent == 0:
                     print("Agent 1 -> ",data)
@@ -83,10 +98,10 @@ def server_for_go(host='localhost', port=12345):
                     print("Agent 2 -> ",data)
                 
                 # Verificar se a jogada é válida
-                if is_move_valid(Go, i,j):
+                if Go.is_legal(i,j):
                     agents[current_agent].sendall(b'VALID') # Envia a mensagem de validação
                     agents[1-current_agent].sendall(data.encode()) # Envia a jogada para o outro agente
-                    Go = Go.move(i,j) # Executa o move
+                    Go.play(i,j) # Executa o move
                     time.sleep(0.1)
                     drawBoard(Go, screen) # Desenha o tabuleiro
                     drawPieces(Go, screen) # Desenha as peças
@@ -99,7 +114,7 @@ def server_for_go(host='localhost', port=12345):
                     if invalid_count >= 3:   # Se o agente fizer 3 jogadas inválidas seguidas, passa
                         agents[current_agent].sendall(b'TURN LOSS')
                         agents[1-current_agent].sendall(b'PASS')
-                        Go = Go.pass_turn()
+                        Go.pass_turn()
                         invalid_count = 0
                         yet_invalid = False
             pygame.display.update()
@@ -164,9 +179,10 @@ def server_for_atax(host='localhost', port=12345):
     print("------------------------------------")
 
 
-    atax = Atax(n_board(Game))    # Jogo iniciado do connect
+    atax = Atax(n_board(Game), layout=LAYOUT, max_plies=ATAXX_MAX_PLIES)    # Jogo iniciado do connect
     initial_board = atax.get_initial_state()
     ata= State(initial_board,1)
+    ata.track_history()   # para acabar o jogo quando uma posição se repete 3 vezes
 
     # Lista de agentes
     agents = [agent1, agent2]
@@ -188,10 +204,7 @@ def server_for_atax(host='localhost', port=12345):
                 break
             else:
                 # Processing the move (example: "MOVE X,Y")
-                i = int(data[5])
-                j = int(data[7])
-                k= int(data[9])
-                l=int(data[11])
+                i, j, k, l = parse_move(data)
                 
                 if current_agent == 0:
                     print("Agent 1 -> ",data)
@@ -224,7 +237,7 @@ def server_for_atax(host='localhost', port=12345):
             print(ata.matrix)
             
             # Verificar se o jogo acabou
-            winner, terminated = atax.get_value_and_terminated(ata.matrix)
+            winner, terminated = atax.get_value_and_terminated(ata) # usa as contagens guardadas no State
             if terminated:
                 # Obter o vencedor e os scores
                 if winner == -1:
@@ -256,7 +269,7 @@ def server_for_atax(host='localhost', port=12345):
     server_socket.close()
 
 if __name__ == "__main__":
-    if number < 3:
+    if Game[0] == "G":
         server_for_go()
     else:
         server_for_atax()
\ No newline at end of file
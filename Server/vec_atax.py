@@ -0,0 +1,127 @@
+import numpy as np
+import atax
+from Connect_Ataxx import Atax
+
+# Ambiente com N jogos de Ataxx em paralelo para o self-play.
+# Os tabuleiros estão num array (N, n, n) com as cores absolutas (1 e -1) e as N ações são aplicadas de
+# uma vez (colocação, remoção da origem nos saltos e infeção da vizinhança 3x3 do destino) com indexação
+# do numpy, sem criar atax.State nem atax.Move.
+# As ações são as do Connect_Ataxx ((xi*n+yi)*24 + k, -1 para passar) e o fim do jogo segue as
+# mesmas regras do Atax.winner. Quando um jogo acaba é reiniciado logo.
+# Com um layout (casas bloqueadas com 8) todos os jogos começam nesse tabuleiro.
+# Cada jogo guarda os hashes das posições por onde passou: com 3 repetições da mesma posição ou ao chegar
+# a max_plies jogadas o jogo acaba e ganha quem tiver mais peças (como no Atax.get_value_and_terminated).
+class VecAtaxxEnv:
+    def __init__(self, num_games, n, layout=None, max_plies=None):
+        self.num_games = num_games
+        self.n = n
+        self.game = Atax(n, layout=layout, max_plies=max_plies)
+        self.max_plies = max_plies
+        self.action_size = self.game.action_size
+        offsets = np.array(atax.OFFSETS)
+        self.dx, self.dy = offsets[:, 0], offsets[:, 1]
+        self.jump = np.abs(offsets).max(axis=1) == 2
+        # vizinhos (clone ring) de cada casa no tabuleiro achatado, com n*n para as casas fora do tabuleiro
+        r = self.game.rings
+        self.neighbours = np.full((n*n, 8), n*n)
+        for s in range(n*n):
+            ring = list(atax.iter_bits(r.clone[s]))
+            self.neighbours[s, :len(ring)] = ring
+        self.boards = np.zeros((num_games, n, n))
+        self.turn = np.ones(num_games, dtype=int)
+        self.plies = np.zeros(num_games, dtype=int) # número de jogadas de cada jogo
+        self.history = [{} for _ in range(num_games)] # hash da posição -> número de vezes, de cada jogo
+        self.episodes = np.zeros(num_games, dtype=int) # número de jogos já terminados em cada posição do batch
+        self.reset()
+
+    def __repr__(self):
+        return "VecAtax"
+
+    # reinicia os jogos indicados (ou todos)
+    def reset(self, games=None):
+        if games is None:
+            games = np.arange(self.num_games)
+        self.boards[games] = self.game.get_initial_state()
+        self.turn[games] = 1
+        self.plies[games] = 0
+        h = int(atax.position_hash(self.game.get_initial_state()))
+        for k in games:
+            self.history[k] = {h: 1}
+        return self.boards
+
+    # tabuleiros na perspetiva do jogador que joga a seguir (como o change_perspective)
+    def get_neutral_states(self):
+        return self.game.change_perspective(self.boards, self.turn[:, None, None])
+
+    # jogadas válidas de todos os jogos (do jogador que joga), num array (N, n*n*24)
+    def legal_mask(self):
+        return self.game.valid_moves_mask(self.get_neutral_states())
+
+    # aplica uma ação a cada jogo e retorna (boards, legal_mask, terminated, value): os tabuleiros e as
+    # jogadas válidas já depois de reiniciar os jogos que acabaram, e o value na perspetiva do jogador que
+    # fez a jogada
+    def step(self, actions):
+        actions = np.asarray(actions)
+        n = self.n
+        mover = self.turn.copy()
+        games = np.flatnonzero(actions >= 0)
+        a = actions[games]
+        k = a % 24
+        xi, yi = np.divmod(a // 24, n)
+        xf, yf = xi + self.dx[k], yi + self.dy[k]
+        player = mover[games]
+        jump = self.jump[k]
+        self.boards[games[jump], xi[jump], yi[jump]] = 0
+        self.boards[games, xf, yf] = player
+
+        # infeção: as peças do adversário à volta do destino passam para o jogador
+        flat = np.zeros((self.num_games, n*n + 1))
+        flat[:, :n*n] = self.boards.reshape(self.num_games, -1)
+        around = self.neighbours[xf*n + yf]
+        values = flat[games[:, None], around]
+        flat[games[:, None], around] = np.where(values == -player[:, None], player[:, None], values)
+        self.boards[:] = flat[:, :n*n].reshape(self.boards.shape)
+        self.turn = -mover
+        self.plies += 1
+
+        # repetições: os hashes são calculados de uma vez para todos os jogos
+        repetitions = np.zeros(self.num_games, dtype=int)
+        for k, h in enumerate(atax.position_hash(self.boards, self.turn).tolist()):
+            repetitions[k] = self.history[k][h] = self.history[k].get(h, 0) + 1
+        adjudicated = repetitions >= 3
+        if self.max_plies is not None:
+            adjudicated |= self.plies >= self.max_plies
+
+        masks = {1: self.game.valid_moves_mask(self.boards), -1: self.game.valid_moves_mask(self.game.change_perspective(self.boards, -1))}
+        terminated, winner = self.terminal_and_winner(masks[1].any(axis=1), masks[-1].any(axis=1), adjudicated)
+        value = winner * mover
+        legal = np.where(self.turn[:, None] == 1, masks[1], masks[-1])
+
+        finished = np.flatnonzero(terminated)
+        if len(finished):
+            self.episodes[finished] += 1
+            self.reset(finished)
+            legal[finished] = self.game.valid_moves_mask(self.boards[finished])
+        return self.boards, legal, terminated, value
+
+    # (terminated, winner) de todos os jogos com as regras do Atax.winner; os jogos em adjudicated que não
+    # acabaram ficam decididos pelo número de peças
+    def terminal_and_winner(self, has_move_1=None, has_move_m1=None, adjudicated=None):
+        flat = self.boards.reshape(self.num_games, -1)
+        empty = (flat == 0).sum(axis=1)
+        pieces_1 = (flat == 1).sum(axis=1)
+        pieces_m1 = (flat == -1).sum(axis=1)
+        if has_move_1 is None:
+            has_move_1 = self.game.valid_moves_mask(self.boards).any(axis=1)
+            has_move_m1 = self.game.valid_moves_mask(self.game.change_perspective(self.boards, -1)).any(axis=1)
+        if adjudicated is None:
+            adjudicated = np.zeros(self.num_games, dtype=bool)
+        conditions = [empty == 0, pieces_1 == 0, pieces_m1 == 0, ~has_move_1, ~has_move_m1, adjudicated]
+        choices = [np.sign(pieces_1 - pieces_m1),
+                   -1,
+                   1,
+                   np.where(pieces_1 < pieces_m1 + empty, -1, 1),
+                   np.where(pieces_m1 < pieces_1 + empty, 1, -1),
+                   np.sign(pieces_1 - pieces_m1)]
+        terminated = np.any(conditions, axis=0)
+        return terminated, np.select(conditions, choices, default=0)
@@ -0,0 +1,171 @@
+import numpy as np
+import go
+
+# Ambiente com N jogos de Go em paralelo para o self-play.
+# Os tabuleiros estão num array (N, n, n) com as cores absolutas (1 pretas, -1 brancas), e a vez, o
+# contador de pass, o número de jogadas e o hash de Zobrist de cada jogo estão em arrays (N,).
+# As jogadas válidas e as capturas são calculadas para os N jogos de uma vez com o numpy: os grupos são
+# identificados com o go.label_groups, as liberdades de cada grupo contadas com um bincount sobre as
+# posições vazias, e uma posição vazia é válida se tiver um vizinho vazio, um grupo amigo vizinho com 2
+# ou mais liberdades ou um grupo adversário vizinho só com essa liberdade (que fica capturado).
+# Superko: os hashes das posições por onde cada jogo passou ficam num só array ordenado (seen), com um
+# salt aleatório por jogo para os jogos não se misturarem, e as N*n*n posições seguintes são procuradas
+# com um searchsorted. Quando um jogo acaba é reiniciado logo, com um salt novo, para o número de jogos
+# no batch ficar constante; os hashes dos jogos que acabaram são retirados do seen de vez em quando.
+class VecGoEnv:
+    def __init__(self, num_games, n, seed=None):
+        self.num_games = num_games
+        self.n = n
+        self.action_size = n*n+1
+        self.neighbours = go.neighbour_index_table(n) # vizinhos de cada posição, com n*n fora do tabuleiro
+        self.keys = go.zobrist_table(n).reshape(3, n*n) # chaves de Zobrist de cada cor (índice -1 para o -1)
+        self.rng = np.random.default_rng(seed)
+        self.boards = np.zeros((num_games, n, n)) # tabuleiros de todos os jogos
+        self.turn = np.ones(num_games, dtype=int) # vez do jogador em cada jogo
+        self.pass_count = np.zeros(num_games, dtype=int) # número de pass seguidos em cada jogo
+        self.play_idx = np.zeros(num_games, dtype=int) # número de jogadas de cada jogo
+        self.hashes = np.zeros(num_games, dtype=np.uint64) # hash de Zobrist da posição atual de cada jogo
+        self.salt = np.zeros(num_games, dtype=np.uint64)
+        # hashes (com o salt) das posições de cada jogo; um jogo faz no máximo 2*n*n jogadas
+        self.history = np.zeros((num_games, 2*n*n+1), dtype=np.uint64)
+        self.history_len = np.zeros(num_games, dtype=int)
+        self.seen = np.zeros(0, dtype=np.uint64) # hashes de history, ordenados, mais os dos jogos que acabaram
+        self.episodes = np.zeros(num_games, dtype=int) # número de jogos já terminados em cada posição do batch
+        self.moves = None # resultado do _analyse da posição atual
+        self.reset()
+
+    def __repr__(self):
+        return "VecGo"
+
+    # reinicia os jogos indicados (ou todos)
+    def reset(self, games=None):
+        if games is None:
+            games = np.arange(self.num_games)
+        self.boards[games] = 0
+        self.turn[games] = 1
+        self.pass_count[games] = 0
+        self.play_idx[games] = 0
+        self.hashes[games] = 0
+        self.salt[games] = self.rng.integers(0, 2**64, size=len(games), dtype=np.uint64, endpoint=False)
+        self.history_len[games] = 0
+        if len(self.seen) > 2 * self.history_len.sum() + 4 * self.num_games:
+            # a maior parte do seen já é de jogos que acabaram
+            self.seen = np.sort(self.history[np.arange(self.history.shape[1]) < self.history_len[:, None]])
+        self.add_positions(games)
+        self.moves = None
+        return self.boards
+
+    # junta a posição atual dos jogos indicados ao histórico do superko
+    def add_positions(self, games):
+        salted = self.hashes[games] ^ self.salt[games]
+        self.history[games, self.history_len[games]] = salted
+        self.history_len[games] += 1
+        salted = np.sort(salted)
+        self.seen = np.insert(self.seen, np.searchsorted(self.seen, salted), salted)
+
+    # tabuleiros na perspetiva do jogador que joga a seguir (como o change_perspective)
+    def get_neutral_states(self):
+        return self.boards * self.turn[:, None, None]
+
+    # calcula, para a posição atual de todos os jogos, as jogadas válidas (N, n*n+1), os labels dos
+    # grupos (N, n*n), os labels dos grupos adversários que cada jogada captura (N, n*n, 4, com n*n
+    # nas posições sem captura) e o hash da posição depois de cada jogada (N, n*n)
+    def _analyse(self):
+        if self.moves is not None:
+            return self.moves
+        N, n = self.num_games, self.n
+        games = np.arange(N)[:, None]
+        board = self.boards.reshape(N, n*n).astype(int)
+        labels = go.label_groups(self.boards).reshape(N, n*n)
+        empty = board == 0
+
+        # cor (2 fora do tabuleiro) e label dos 4 vizinhos de cada posição
+        colour = np.append(board, np.full((N, 1), 2), axis=1)[:, self.neighbours]
+        group = np.append(labels, np.full((N, 1), n*n), axis=1)[:, self.neighbours]
+        # cada grupo vizinho conta uma só vez por posição
+        repeated = np.zeros(group.shape, dtype=bool)
+        for k in range(1, 4):
+            repeated[:, :, k] = (group[:, :, k:k+1] == group[:, :, :k]).any(axis=2)
+        unique = (group < n*n) & ~repeated
+
+        # liberdades de cada grupo: número de posições vazias vizinhas diferentes
+        region = games[:, :, None] * (n*n+1) + group
+        counted = unique & empty[:, :, None]
+        liberties = np.bincount(region[counted], minlength=N*(n*n+1)).reshape(N, n*n+1)
+        neighbour_liberties = liberties[games[:, :, None], group]
+
+        # hash das peças de cada grupo
+        stones = np.flatnonzero(~empty)
+        stone_keys = self.keys[board.ravel()[stones], stones % (n*n)]
+        group_hash = np.zeros(N*(n*n+1), dtype=np.uint64)
+        np.bitwise_xor.at(group_hash, stones // (n*n) * (n*n+1) + labels.ravel()[stones], stone_keys)
+        group_hash = group_hash.reshape(N, n*n+1)
+
+        turn = self.turn[:, None, None]
+        captured = unique & (colour == -turn) & (neighbour_liberties == 1)
+        safe = empty & ((colour == 0).any(axis=2)
+                        | ((colour == turn) & (neighbour_liberties >= 2)).any(axis=2)
+                        | captured.any(axis=2))
+
+        # hash de cada jogada, com as peças capturadas retiradas
+        capture_hash = np.where(captured, group_hash[games[:, :, None], group], np.uint64(0))
+        next_hash = (self.hashes[:, None] ^ self.keys[self.turn]
+                     ^ np.bitwise_xor.reduce(capture_hash, axis=2))
+
+        # superko: retira as jogadas que repetem uma posição do jogo
+        salted = next_hash ^ self.salt[:, None]
+        found = np.searchsorted(self.seen, salted)
+        repeats = self.seen[np.minimum(found, len(self.seen) - 1)] == salted
+
+        legal = np.ones((N, n*n+1), dtype=bool)
+        legal[:, :-1] = safe & ~repeats
+        self.moves = (legal, labels, np.where(captured, group, n*n), next_hash)
+        return self.moves
+
+    # jogadas válidas de todos os jogos, num array (N, n*n+1) de booleanos (a última é o pass)
+    def legal_mask(self):
+        return self._analyse()[0].copy()
+
+    # aplica uma ação a cada jogo (n*n é o pass) e retorna (boards, legal_mask, terminated, value): os
+    # tabuleiros e as jogadas válidas já depois de reiniciar os jogos que acabaram, e o value na
+    # perspetiva do jogador que fez a jogada (como o VecAtaxxEnv.step)
+    def step(self, actions):
+        actions = np.asarray(actions)
+        n = self.n
+        _, labels, captures, next_hash = self._analyse()
+        games = np.flatnonzero(actions != n*n)
+        points = actions[games]
+
+        # retira os grupos capturados e põe a peça
+        board = self.boards.reshape(self.num_games, n*n)
+        removed = (labels[games, :, None] == captures[games, points][:, None, :]).any(axis=2)
+        board[games] = np.where(removed, 0, board[games])
+        board[games, points] = self.turn[games]
+        self.hashes[games] = next_hash[games, points]
+        self.add_positions(games)
+
+        passed = actions == n*n
+        self.pass_count = np.where(passed, self.pass_count + 1, 0)
+        self.play_idx += 1
+        self.turn = -self.turn
+        self.moves = None
+
+        terminated, value = self.terminal_and_value()
+        finished = np.flatnonzero(terminated)
+        self.episodes[finished] += 1
+        if len(finished):
+            self.reset(finished)
+        return self.boards, self.legal_mask(), terminated, value
+
+    # retorna (terminated, value) de cada jogo na posição atual, com o value na perspetiva do
+    # jogador que fez a última jogada (as mesmas regras do go.is_game_finished)
+    def terminal_and_value(self):
+        terminated = (self.pass_count == 2) | (self.play_idx >= 2*self.n*self.n)
+        value = np.zeros(self.num_games)
+        finished = np.flatnonzero(terminated)
+        if len(finished):
+            # os jogos que acabaram são contados todos de uma vez
+            scores = go.score_boards(self.boards[finished])
+            winner = np.sign(scores[:, 0] - scores[:, 1])
+            value[finished] = winner * -self.turn[finished]
+        return terminated, value
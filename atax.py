@@ -5,6 +5,7 @@ from tkinter import *
 from tkinter import messagebox
 import numpy as np
 import copy as cp
+from functools import lru_cache
 
 # 0 - empty, 1 - player_1, 2 - player_2 e 8 - black_square
 
@@ -105,6 +106,126 @@ class Move:
                or abs(self.yi - self.yf) == dist and abs(self.xi - self.xf) <= dist
 
 
+# ------------------------------------------------------------------
+# Bitboard core:
+# each player is stored in a python int where bit i*nb+j is the square (i,j)
+# ------------------------------------------------------------------
+
+# the 24 (dx, dy) offsets of a move, in the same order as the actions of Connect_Ataxx
+OFFSETS = [(dx, dy) for dx in range(-2, 3) for dy in range(-2, 3) if (dx, dy) != (0, 0)]
+
+
+class Rings:
+    def __init__(self, nb, blocked=0):
+        """precomputed clone (1-ring) and jump (2-ring) masks of every square of a nb x nb board,
+        without the blocked squares (bitboard of the 8s of the layout)"""
+        self.nb = nb
+        self.blocked = blocked
+        self.clone = [0] * (nb * nb)
+        self.jump = [0] * (nb * nb)
+        self.targets = [[] for _ in range(nb * nb)]  # (target, offset index) of each square, by target
+        first_neighbour = [None] * (nb * nb)
+        for i in range(nb):
+            for j in range(nb):
+                s = i * nb + j
+                for k, (dx, dy) in enumerate(OFFSETS):
+                    if inside(i + dx, j + dy, nb):
+                        t = (i + dx) * nb + j + dy
+                        if abs(dx) <= 1 and abs(dy) <= 1 and first_neighbour[t] is None:
+                            first_neighbour[t] = s
+                        if blocked >> t & 1:
+                            continue
+                        if abs(dx) <= 1 and abs(dy) <= 1:
+                            self.clone[s] |= 1 << t
+                        else:
+                            self.jump[s] |= 1 << t
+                        self.targets[s].append((t, k))
+        self.reach = [c | j for c, j in zip(self.clone, self.jump)]
+        # canonical action of a clone to each target: the clone from its first neighbour (the source of a clone
+        # does not change the resulting position), the same for every layout
+        self.clone_action = [0] * (nb * nb)
+        for t, s in enumerate(first_neighbour):
+            self.clone_action[t] = s * 24 + OFFSETS.index((t // nb - s // nb, t % nb - s % nb))
+
+
+@lru_cache(maxsize=None)
+def rings(nb, blocked=0):
+    """returns the masks of a nb x nb board, cached by size and blocked squares (one per layout)"""
+    return Rings(nb, blocked)
+
+
+def load_layout(f):
+    """loads a board file (0 - empty, 1 - player_1, 2 - player_2, 8 - black_square) with the players as 1 and -1"""
+    layout = np.loadtxt(f, dtype='i', delimiter=' ')
+    layout[layout == 2] = -1
+    return layout
+
+
+@lru_cache(maxsize=None)
+def zobrist_table(nb):
+    """returns the zobrist keys of the pieces of player 1 and -1 in each square, shape (2, nb*nb),
+    and the key xored when player -1 is to move"""
+    rng = np.random.default_rng(nb)
+    keys = rng.integers(0, 2**63, size=(2, nb * nb + 1), dtype=np.int64)
+    return keys[:, :-1], keys[0, -1] ^ keys[1, -1]
+
+
+def position_hash(matrix, player=1):
+    """returns the zobrist hash of a position (pieces and player to move), or of each board of a batch"""
+    matrix = np.asarray(matrix)
+    nb = matrix.shape[-1]
+    keys, turn = zobrist_table(nb)
+    flat = matrix.reshape(matrix.shape[:-2] + (nb * nb,))
+    h = np.bitwise_xor.reduce(np.where(flat == 1, keys[0], 0) ^ np.where(flat == -1, keys[1], 0), axis=-1)
+    return h ^ np.where(np.asarray(player) == -1, turn, 0)
+
+
+def bits_of(matrix, value):
+    """returns the bitboard of the squares of the matrix equal to value"""
+    plane = np.asarray(matrix).ravel() == value
+    return int.from_bytes(np.packbits(plane, bitorder='little').tobytes(), 'little')
+
+
+def iter_bits(bits):
+    """yields the index of every set bit, in ascending order"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def move_targets(own, empty, r, unique_clones=False):
+    """yields (source, target, offset index) of every move of the pieces in own,
+    with unique_clones only the first clone to each target is listed"""
+    cloned = 0
+    for s in iter_bits(own):
+        free = r.reach[s] & empty
+        if free:
+            if unique_clones:
+                free &= ~(cloned & r.clone[s])
+                cloned |= r.clone[s]
+            for t, k in r.targets[s]:
+                if free >> t & 1:
+                    yield s, t, k
+
+
+def has_moves(own, empty, r):
+    """checks if any piece in own can move"""
+    for s in iter_bits(own):
+        if r.reach[s] & empty:
+            return True
+    return False
+
+
+def play_bits(own, opp, s, t, r):
+    """moves from s to t (clone or jump) and infects the adjacent pieces, returns the new (own, opp)"""
+    flip = r.clone[t] & opp
+    own |= flip | (1 << t)
+    if r.jump[s] >> t & 1:
+        own &= ~(1 << s)
+    return own, opp & ~flip
+
+
 class State:
     def __init__(self, matrix, player):
         """class that defines the state of the board"""
@@ -112,6 +233,11 @@ class State:
         self.player = player
         self.nb= len(matrix)
         self.winner = -1
+        self.counts = None  # pieces of each player and empty squares, kept by execute_move
+        self.witness = {}  # last (source, target) move found for each player
+        self.ply = 0  # moves made with execute_move
+        self.hash = None  # hash of the position, kept after track_history()
+        self.history = None  # number of times each position was reached, kept after track_history()
 
 
 
@@ -131,20 +257,18 @@ class State:
             return False
         return True
 
-    def available_moves(self, player):
-        """returns a list of all the possible moves of a certain player"""
-        moves = np.array([])
-        for i in range(len(self.matrix)):
-            for j in range(len(self.matrix[0])):
-                if self.matrix[i][j] == player:
-                    for dx in range(-2, 3):
-                        for dy in range(-2, 3):
-                            if self.nb > i + dx >= 0 and self.nb > j + dy >= 0:
-                                if self.matrix[i + dx][j + dy] == 0:
-                                    move = Move(i, j, i + dx, j + dy, player, 0)
-                                    move.ty = move.movement_type()
-                                    moves = np.append(moves, move)
-        return moves
+    def available_moves(self, player, unique_clones=False):
+        """returns a list of all the possible moves of a certain player,
+        with unique_clones the clones that reach the same square are listed once"""
+        r = rings(self.nb)
+        own, empty = bits_of(self.matrix, player), bits_of(self.matrix, 0)
+        moves = [Move(s // self.nb, s % self.nb, t // self.nb, t % self.nb, player, 1 if r.clone[s] >> t & 1 else 2)
+                 for s, t, k in move_targets(own, empty, r, unique_clones)]
+        if not moves:
+            return np.array([])
+        result = np.empty(len(moves), dtype=object)
+        result[:] = moves
+        return result
 
     def experimental_move(self, move):
         """moves a piece according to the movement type"""
@@ -156,19 +280,51 @@ class State:
 
     def multiply(self, move):
         """makes all the surrounding pieces equal to the played one"""
-        for dx in range(-1, 2):
-            for dy in range(-1, 2):
-                if inside(move.xf + dx, move.yf + dy,self.nb):
-                    if self.matrix[move.xf + dx][move.yf + dy] == other_player(move.player):
-                        self.matrix[move.xf + dx][move.yf + dy] = move.player
+        flip = rings(self.nb).clone[move.xf * self.nb + move.yf] & bits_of(self.matrix, other_player(move.player))
+        if flip:
+            self.matrix.flat[list(iter_bits(flip))] = move.player
+        return flip.bit_count()
 
     def isEndState(self):
         """checks if a state is an end state"""
-        return self.available_moves(1).size == 0 or self.available_moves(-1).size == 0
+        return not self.has_move(1) or not self.has_move(-1)
+
+    def piece_counts(self):
+        """returns {0: empty squares, 1: pieces of player 1, -1: pieces of player -1}"""
+        if self.counts is None:
+            self.counts = {v: bits_of(self.matrix, v).bit_count() for v in (0, 1, -1)}
+        return self.counts
+
+    def has_move(self, player):
+        """checks if a player has any move, the last move found is reused while it stays possible"""
+        w = self.witness.get(player)
+        if w is not None and self.matrix.flat[w[0]] == player and self.matrix.flat[w[1]] == 0:
+            return True
+        r = rings(self.nb)
+        empty = bits_of(self.matrix, 0)
+        for s in iter_bits(bits_of(self.matrix, player)):
+            free = r.reach[s] & empty
+            if free:
+                self.witness[player] = (s, (free & -free).bit_length() - 1)
+                return True
+        self.witness[player] = None
+        return False
+
+    def track_history(self):
+        """starts keeping the hash of the position and how many times each position was reached"""
+        self.hash = int(position_hash(self.matrix, self.player))
+        self.history = {self.hash: 1}
+
+    def repetitions(self):
+        """returns how many times the current position was reached (1 without track_history())"""
+        if self.history is None:
+            return 1
+        return self.history[self.hash]
 
     def ler_fich(self, f):
         """loads a file"""
         self.matrix = np.loadtxt(f, dtype='i', delimiter=' ')
+        self.counts = None
 
     def evaluation_function(self):
         """returns the difference of pieces of both players"""
@@ -180,18 +336,24 @@ class State:
 
     def count_pieces(self, player):
         """counts pieces"""
-        cp = 0
-        for i in range(0, self.nb):
-            for j in range(0, self.nb):
-                if self.matrix[i, j] == player:
-                    cp = cp + 1
-        return cp
+        return bits_of(self.matrix, player).bit_count()
 
     def execute_move(self, move):
         """makes a move and changes the turn"""
         self.experimental_move(move)
-        self.multiply(move)
+        flipped = self.multiply(move)
+        if self.counts is not None:
+            if move.player in (1, -1):
+                self.counts[move.player] += flipped + (move.ty == 1)
+                self.counts[-move.player] -= flipped
+                self.counts[0] -= move.ty == 1
+            else:
+                self.counts = None
         self.player = - self.player
+        self.ply += 1
+        if self.history is not None:
+            self.hash = int(position_hash(self.matrix, self.player))
+            self.history[self.hash] = self.history.get(self.hash, 0) + 1
         return self.matrix
 
 
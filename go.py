@@ -4,47 +4,266 @@ import copy as cp
 from copy import deepcopy
 import time
 import sys
+import struct
 
 # Código inspirado em https://github.com/kelbyh2o/GO_Game_Python/tree/master
 
 # Constante para adicionar ao score do 2 jogador
 KOMI = 5.5   
 
+# Grupo de peças ligadas da mesma cor, com as suas liberdades.
+# Os grupos nunca são alterados depois de criados: uma jogada cria grupos novos
+# apenas para as cadeias vizinhas da posição jogada, por isso os estados podem partilhá-los.
+class Group:
+    __slots__ = ('color', 'stones', 'liberties')
+
+    def __init__(self, color, stones, liberties):
+        self.color = color # cor das peças do grupo
+        self.stones = stones # frozenset com as posições das peças
+        self.liberties = liberties # frozenset com as posições vazias adjacentes
+
+
+# Histórico das posições de um jogo para o superko, partilhado entre os estados em vez de um set copiado
+# em cada jogada: cada estado guarda só o nó (hash, anterior) da sua posição, e seen é um set único, do
+# jogo, com os hashes de todos os nós criados a partir do mesmo início (em todos os ramos, por exemplo os
+# da árvore do MCTS). Um hash que não está no seen nunca apareceu; se estiver (quase nunca acontece, só
+# quando a jogada repete uma posição de algum ramo), confirma-se subindo pela lista do estado.
+class History:
+    __slots__ = ('hash', 'previous', 'seen')
+
+    def __init__(self, hash, previous=None, seen=None):
+        self.hash = hash # hash da posição
+        self.previous = previous # nó da posição anterior (None no início)
+        self.seen = set() if seen is None else seen
+        self.seen.add(hash)
+
+    # histórico com mais uma posição
+    def add(self, hash):
+        return History(hash, self, self.seen)
+
+    def __contains__(self, hash):
+        if hash not in self.seen:
+            return False
+        node = self
+        while node is not None:
+            if node.hash == hash:
+                return True
+            node = node.previous
+        return False
+
+
+# histórico a partir dos hashes das posições do jogo, pela ordem em que apareceram
+def history_of(hashes):
+    history = None
+    for h in hashes:
+        history = History(h) if history is None else history.add(h)
+    return history
+
+
 # Classe que representa o estado do jogo
 class GameState:
-    def __init__(self,board,turn=1,play_idx=0,pass_count=0,previous_boards={1:None, -1:None},empty_positions=None,parent=None):
+    # com __slots__ cada estado ocupa menos memória (não há um __dict__ por estado)
+    __slots__ = ('n', 'board', 'turn', 'play_idx', 'pass_count', 'parent', 'empty_positions',
+                 'chain_id', 'chains', 'next_id', 'hash', 'history', 'end', 'winner', 'scores')
+
+    def __init__(self,board,turn=1,play_idx=0,pass_count=0,previous_boards=None,empty_positions=None,parent=None,chain_id=None,chains=None,next_id=0,hash=None,history=None):
         self.n = len(board) # tamanho do board
         self.board = board # board
         self.turn = turn # vez do jogador
         self.play_idx = play_idx # número de jogadas feitas
         self.pass_count = pass_count # número de pass feitos
-        self.previous_boards = previous_boards # dicionário que armazena o board anterior de cada jogador
         self.parent=parent # estado anterior
         if empty_positions is None:
             # armazena as posições vazias do board para ajudar a determinar os movimentos possíveis
             self.empty_positions = set([(x,y) for x in range(self.n) for y in range(self.n) if self.board[x][y]==0])
         else:
             self.empty_positions = empty_positions  
+        if chain_id is None:
+            # identifica os grupos do board (só acontece quando o estado é criado a partir de um board)
+            chain_id, chains, next_id = build_groups(self.board)
+        self.chain_id = chain_id # id do grupo de cada posição (-1 se estiver vazia)
+        self.chains = chains # dicionário id -> Group
+        self.next_id = next_id # próximo id livre para um grupo
+        if hash is None:
+            hash = zobrist_hash(self.board)
+        self.hash = hash # hash de Zobrist do board
+        if history is None:
+            # hashes das posições já jogadas (os boards anteriores dados também contam para o superko)
+            previous = [] if previous_boards is None else [zobrist_hash(b) for b in previous_boards.values() if b is not None]
+            history = history_of(previous + [self.hash])
+        self.history = history # History com os hashes de todas as posições do jogo
         self.end = 0 # flag que indica se o jogo acabou
         
     # faz uma jogada na posição (i,j)
     def move(self,i,j):
-        next_board = deepcopy(self.board)
+        neighbours = neighbour_table(self.n)
+        keys = zobrist_table(self.n)
+        next_board = self.board.copy()
         next_board[i][j] = self.turn
-        next_board, next_empty_positions = check_for_captures(next_board, self.turn, self.empty_positions) # processa as capturas
-        next_previous_boards = deepcopy(self.previous_boards) 
-        next_previous_boards[self.turn] = deepcopy(next_board)
+        next_hash = self.hash ^ int(keys[self.turn][i][j])
+        next_chain_id = self.chain_id.copy()
+        next_chains = dict(self.chains)
+        next_empty_positions = set(self.empty_positions)
         next_empty_positions.remove((i,j)) # remove a posição (i,j) da lista de posições vazias
-        next_state = GameState(next_board,-self.turn,self.play_idx+1,0,next_previous_boards,next_empty_positions,parent=self) # cria o próximo estado
+
+        # só as cadeias vizinhas de (i,j) podem ser afetadas pela jogada
+        stones = {(i,j)}
+        liberties = set()
+        friends = []
+        captured = []
+        seen = set()
+        for q in neighbours[(i,j)]:
+            cid = next_chain_id[q]
+            if cid < 0:
+                liberties.add(q)
+                continue
+            if cid in seen:
+                continue # cadeia já tratada por outro vizinho
+            seen.add(cid)
+            group = next_chains.pop(cid)
+            if group.color == self.turn:
+                friends.append((cid, group))
+            elif len(group.liberties) == 1:
+                captured.append(group) # a única liberdade era (i,j)
+            else:
+                next_chains[cid] = Group(group.color, group.stones, group.liberties - {(i,j)})
+
+        # junta os grupos amigos ao maior deles (só as peças dos outros mudam de id)
+        if friends:
+            friends.sort(key=lambda f: len(f[1].stones), reverse=True)
+            new_id = friends[0][0]
+            for cid, group in friends:
+                if cid != new_id:
+                    for q in group.stones:
+                        next_chain_id[q] = new_id
+                stones |= group.stones
+                liberties |= group.liberties
+        else:
+            new_id = self.next_id
+        next_chain_id[i][j] = new_id
+        liberties.discard((i,j))
+
+        # processa as capturas: as posições libertadas passam a ser liberdades dos grupos vizinhos
+        gained = {}
+        for group in captured:
+            for q in group.stones:
+                next_board[q] = 0
+                next_hash ^= int(keys[-self.turn][q])
+                next_chain_id[q] = -1
+                next_empty_positions.add(q)
+            for q in group.stones:
+                for r in neighbours[q]:
+                    cid = next_chain_id[r]
+                    if cid == new_id:
+                        liberties.add(q)
+                    elif cid >= 0:
+                        gained.setdefault(cid, set()).add(q)
+        for cid, new_liberties in gained.items():
+            group = next_chains[cid]
+            next_chains[cid] = Group(group.color, group.stones, group.liberties | new_liberties)
+        next_chains[new_id] = Group(self.turn, frozenset(stones), frozenset(liberties))
+
+        next_state = GameState(next_board,-self.turn,self.play_idx+1,0,None,next_empty_positions,parent=self,
+                               chain_id=next_chain_id,chains=next_chains,next_id=max(self.next_id,new_id+1),
+                               hash=next_hash,history=self.history.add(next_hash)) # cria o próximo estado
         return next_state
     
     # função para passar a vez
     def pass_turn(self):
-        next_previous_boards = deepcopy(self.previous_boards)
-        next_previous_boards[self.turn] = deepcopy(self.board)
-        next_state = GameState(self.board,-self.turn,self.play_idx+1,self.pass_count+1,next_previous_boards,self.empty_positions,parent=self)
+        next_state = GameState(self.board,-self.turn,self.play_idx+1,self.pass_count+1,None,self.empty_positions,parent=self,
+                               chain_id=self.chain_id,chains=self.chains,next_id=self.next_id,
+                               hash=self.hash,history=self.history)
         return next_state
-            
+
+    # codifica o estado em bytes: n, turn, play_idx, pass_count e hash num cabeçalho de 13 bytes,
+    # seguidos do board com 2 bits por posição (0 vazia, 1 jogador 1, 2 jogador -1).
+    # O parent e o histórico de hashes não são guardados (um 9x9 ocupa 34 bytes): o estado criado pelo
+    # from_bytes começa com o histórico do superko vazio (só com a posição atual), por isso quem o recebe
+    # tem de reconstruir o histórico (history_of) se precisar da regra do superko
+    def to_bytes(self):
+        board = np.asarray(self.board).ravel()
+        codes = np.zeros((self.n*self.n + 3) // 4 * 4, dtype=np.uint8)
+        codes[:board.size][board == 1] = 1
+        codes[:board.size][board == -1] = 2
+        packed = codes[0::4] | (codes[1::4] << 2) | (codes[2::4] << 4) | (codes[3::4] << 6)
+        header = struct.pack('<BbHBQ', self.n, self.turn, self.play_idx, self.pass_count, self.hash)
+        return header + packed.tobytes()
+
+    # cria um estado a partir dos bytes de to_bytes (os grupos são recalculados a partir do board)
+    @staticmethod
+    def from_bytes(data, dtype=int):
+        n, turn, play_idx, pass_count, hash = struct.unpack_from('<BbHBQ', data)
+        packed = np.frombuffer(data, dtype=np.uint8, offset=struct.calcsize('<BbHBQ'))
+        codes = np.stack([(packed >> shift) & 3 for shift in (0, 2, 4, 6)], axis=1).ravel()[:n*n]
+        board = np.zeros(n*n, dtype=dtype)
+        board[codes == 1] = 1
+        board[codes == 2] = -1
+        return GameState(board.reshape(n, n), turn, play_idx, pass_count, hash=hash)
+
+    # o pickle usa o to_bytes, por isso não leva o jogo todo atrás (parent); como o to_bytes, o estado
+    # que chega tem o histórico do superko vazio
+    def __reduce__(self):
+        return (GameState.from_bytes, (self.to_bytes(),))
+
+    # o copy.copy também passaria pelo __reduce__ e perdia o histórico: a cópia partilha todos os
+    # atributos (o board, os grupos, o histórico e o parent), como uma cópia superficial normal
+    def __copy__(self):
+        state = GameState.__new__(GameState)
+        for name in GameState.__slots__:
+            if hasattr(self, name):
+                setattr(state, name, getattr(self, name))
+        return state
+
+    # o deepcopy mantém o histórico; os grupos nunca são alterados, por isso podem ser partilhados
+    def __deepcopy__(self, memo):
+        return GameState(self.board.copy(),self.turn,self.play_idx,self.pass_count,None,set(self.empty_positions),self.parent,
+                         chain_id=self.chain_id.copy(),chains=self.chains,next_id=self.next_id,hash=self.hash,history=self.history)
+
+    # retorna as liberdades do grupo que contém a posição (i,j)
+    def liberties(self,i,j):
+        return self.chains[self.chain_id[i][j]].liberties
+
+    # verifica se o grupo que contém a posição (i,j) está em atari (só tem uma liberdade)
+    def in_atari(self,i,j):
+        return len(self.liberties(i,j)) == 1
+
+    # retorna os grupos do jogador que estão em atari
+    def atari_groups(self,player):
+        return [group for group in self.chains.values() if group.color == player and len(group.liberties) == 1]
+
+    # retorna as peças capturadas se o jogador atual jogar em (i,j)
+    def captured_by(self,i,j):
+        captured = set()
+        for q in neighbour_table(self.n)[(i,j)]:
+            cid = self.chain_id[q]
+            if cid >= 0:
+                group = self.chains[cid]
+                if group.color == -self.turn and len(group.liberties) == 1:
+                    captured |= group.stones
+        return captured
+
+    # regra do suicidio, olhando apenas para as cadeias vizinhas de (i,j)
+    def is_suicide(self,i,j):
+        for q in neighbour_table(self.n)[(i,j)]:
+            cid = self.chain_id[q]
+            if cid < 0:
+                return False # posição vizinha vazia
+            group = self.chains[cid]
+            if group.color == self.turn:
+                if len(group.liberties) > 1:
+                    return False # o grupo amigo fica com outra liberdade
+            elif len(group.liberties) == 1:
+                return False # captura o grupo adversário
+        return True
+
+    # regra do superko posicional: o board resultante não pode repetir uma posição do jogo
+    def is_superko(self,i,j):
+        keys = zobrist_table(self.n)
+        new_hash = self.hash ^ int(keys[self.turn][i][j])
+        for q in self.captured_by(i,j):
+            new_hash ^= int(keys[-self.turn][q])
+        return new_hash in self.history
+
     # retorna o vencedor e os scores
     def get_winner(self):
         scores = self.get_scores()
@@ -90,33 +309,8 @@ class GameState:
     
     # retorna o número de territórios capturados por cada jogador
     def captured_territories_count(self):
-        # dicionário que armazena o número de territórios capturados por cada jogador
-        ct_count = {1: 0, -1: 0}
-        # set que armazena as posições já visitadas
-        visited = set()
-
-        for i in range(self.n):
-            for j in range(self.n):
-                if (i, j) in visited:
-                    continue
-                piece = self.board[i][j]
-
-                if piece != 0:
-                    continue
-                
-                # ct_group armazena as posições do grupo de territórios capturados
-                ct_group, captor = get_captured_territories(i, j, self.board)
-
-                if ct_group is None:
-                    continue
-                
-                # adiciona as posições do grupo de territórios capturados ao set de posições visitadas
-                for (x, y) in ct_group:
-                    visited.add((x, y))
-                    if captor in ct_count:
-                        ct_count[captor] += 1
-
-        return ct_count
+        territories = count_territories(np.asarray(self.board)[None])[0]
+        return {1: int(territories[0]), -1: int(territories[1])}
 
 
     # retorna o vencedor e os scores e termina o jogo
@@ -193,20 +387,62 @@ def is_move_valid(state: GameState, i, j):
 
 # verifica se a jogada é válida tendo em conta as regras do jogo (suicídio e superko)
 def check_possible_moves(state: GameState):
-    possible_moves = set(state.empty_positions)
-
-    invalid_moves = set()
-    for move in possible_moves:
+    possible_moves = set()
+    for move in state.empty_positions:
         i, j = move
         # verifica se a jogada é suicida ou se viola a regra do superko
-        if no_suicide(state.board, state.turn, i, j) or superko(state.board, state.turn, state.previous_boards[state.turn], i, j):
-            invalid_moves.add(move)
-            
-    # retira os moves inválidos ao possible_moves e retorna os novos possible_moves
-    possible_moves -= invalid_moves
+        if not state.is_suicide(i, j) and not state.is_superko(i, j):
+            possible_moves.add(move)
     return possible_moves
 
 
+# retorna a legalidade das n*n+1 ações (a última é o pass) num array numpy de booleanos,
+# calculada de uma vez a partir do número de liberdades de cada grupo vizinho
+def legal_moves_mask(state: GameState):
+    n = state.n
+    keys = zobrist_table(n)
+    neighbours = neighbour_index_table(n) # (n*n, 4), com n*n nas posições fora do tabuleiro
+    turn = state.turn
+
+    # liberdades (e hash, para os grupos em atari) de cada grupo; o índice -1 é o das posições sem grupo
+    libs = np.zeros(state.next_id + 1, dtype=np.int64)
+    chain_hash = np.zeros(state.next_id + 1, dtype=np.uint64)
+    for cid, group in state.chains.items():
+        libs[cid] = len(group.liberties)
+        if len(group.liberties) == 1:
+            h = 0
+            for q in group.stones:
+                h ^= int(keys[group.color][q])
+            chain_hash[cid] = h
+
+    # board e ids dos grupos com uma posição extra para os vizinhos fora do tabuleiro
+    color = np.append(np.asarray(state.board).ravel(), 2)
+    cid = np.append(state.chain_id.ravel(), -1)
+    nb_color = color[neighbours]
+    nb_cid = cid[neighbours]
+    nb_libs = libs[nb_cid]
+
+    # a jogada não é suicídio se tiver uma liberdade direta, se ligar a um grupo amigo com outra
+    # liberdade ou se capturar um grupo adversário
+    captures = (nb_color == -turn) & (nb_libs == 1)
+    ok = (nb_color == 0) | ((nb_color == turn) & (nb_libs > 1)) | captures
+    legal = (color[:-1] == 0) & np.any(ok, axis=1)
+
+    # superko: hash do board resultante, sem contar duas vezes o mesmo grupo capturado
+    new_hash = np.uint64(state.hash) ^ keys[turn].ravel()
+    if np.any(captures):
+        duplicate = np.zeros_like(captures)
+        for k in range(1, 4):
+            duplicate[:, k] = np.any(nb_cid[:, k:k+1] == nb_cid[:, :k], axis=1)
+        new_hash ^= np.bitwise_xor.reduce(np.where(captures & ~duplicate, chain_hash[nb_cid], np.uint64(0)), axis=1)
+    candidates = np.flatnonzero(legal)
+    for k, h in zip(candidates.tolist(), new_hash[candidates].tolist()):
+        if h in state.history:
+            legal[k] = False
+
+    return np.append(legal, True)
+
+
 # regra do suicidio (nao deixa uma peça se suícidar)
 def no_suicide(board, turn, i, j):
     new_board = deepcopy(board)
@@ -245,86 +481,216 @@ def is_game_finished(state: GameState):
 def invalid_position(i,j,n):
     return i < 0 or i >= n or j < 0 or j >= n
 
-# funçao que retorna o grupo de peças capturadas
+# tabela com as posições vizinhas de cada posição, calculada uma vez por tamanho de tabuleiro
+_neighbour_tables = {}
+def neighbour_table(n):
+    if n not in _neighbour_tables:
+        _neighbour_tables[n] = {(i,j): [(x,y) for x,y in [(i-1, j), (i+1, j), (i, j-1), (i, j+1)] if not invalid_position(x,y,n)]
+                                for i in range(n) for j in range(n)}
+    return _neighbour_tables[n]
+
+
+# tabela de vizinhos em índices planos (i*n+j) para as operações com arrays; os vizinhos que ficam
+# fora do tabuleiro apontam para o índice n*n
+_neighbour_index_tables = {}
+def neighbour_index_table(n):
+    if n not in _neighbour_index_tables:
+        table = np.full((n*n, 4), n*n, dtype=np.intp)
+        for (i,j), neighbours in neighbour_table(n).items():
+            for k, (x,y) in enumerate(neighbours):
+                table[i*n+j, k] = x*n+y
+        _neighbour_index_tables[n] = table
+    return _neighbour_index_tables[n]
+
+
+# tabela de Zobrist com uma chave de 64 bits por posição e cor, calculada uma vez por tamanho de tabuleiro
+# (a cor -1 usa o índice -1, e o índice 0 fica a zero para as posições vazias)
+_zobrist_tables = {}
+def zobrist_table(n):
+    if n not in _zobrist_tables:
+        rng = np.random.default_rng(n)
+        keys = rng.integers(1, 2**64, size=(3, n, n), dtype=np.uint64, endpoint=False)
+        keys[0] = 0
+        _zobrist_tables[n] = keys
+    return _zobrist_tables[n]
+
+
+# retorna o hash de Zobrist de um board (é o mesmo que o GameState mantém jogada a jogada)
+def zobrist_hash(board):
+    board = np.asarray(board)
+    n = len(board)
+    keys = zobrist_table(n)
+    rows, cols = np.indices((n, n))
+    return int(np.bitwise_xor.reduce(keys[board.astype(np.intp), rows, cols], axis=None))
+
+
+# identifica todos os grupos do board e as suas liberdades
+def build_groups(board):
+    n = len(board)
+    neighbours = neighbour_table(n)
+    chain_id = np.full((n, n), -1, dtype=np.int32)
+    chains = {}
+    next_id = 0
+    for i in range(n):
+        for j in range(n):
+            color = board[i][j]
+            if color == 0 or chain_id[i][j] >= 0:
+                continue
+            # percorre o grupo com uma pilha em vez de recursão
+            stones = set()
+            liberties = set()
+            stack = [(i,j)]
+            chain_id[i][j] = next_id
+            while stack:
+                p = stack.pop()
+                stones.add(p)
+                for q in neighbours[p]:
+                    if board[q] == 0:
+                        liberties.add(q)
+                    elif board[q] == color and chain_id[q] < 0:
+                        chain_id[q] = next_id
+                        stack.append(q)
+            chains[next_id] = Group(int(color), frozenset(stones), frozenset(liberties))
+            next_id += 1
+    return chain_id, chains, next_id
+
+
+# funçao que retorna o grupo de peças capturadas (o grupo de (i,j) se não tiver liberdades, senão None)
 def flood_fill(i,j,board): 
-    # utiliza a função auxiliar _flood_fill para retornar o grupo de peças capturadas
-    has_liberties, group_positions = _flood_fill(i,j,board[i][j],board,group_positions=set(),_visited=set())
-    if has_liberties:
+    original_piece = board[i][j]
+    # uma posição vazia é ela própria uma liberdade
+    if original_piece == 0:
         return None
-    else:
-        return group_positions
-
-
-# funçao auxiliar que retorna True se a posição (i,j) ou uma posição adjacente a esta tiver pelo menos uma posição vazia adjacente (liberdade),
-# caso contrário, retorna False e também retorna todas as posições do grupo capturado ao qual a posição (i,j) pertence
-def _flood_fill(i,j,original_piece,board,group_positions,_visited):
-    # verifica se a posição (i,j) já foi visitada ou se é inválida
-    if (i,j) in _visited or invalid_position(i,j,len(board)):
-        return False, group_positions  
-    # adiciona a posição (i,j) ao set de posições visitadas
-    _visited.add((i, j))
-    position = board[i][j]
-
-    # se a posição (i,j) for vazia, então tem liberdade
-    if position == 0:
-        return True, group_positions 
-    # se a posição (i,j) tiver uma peça de cor diferente da peça original, então não tem liberdade
-    elif position == -original_piece:
-        return False, group_positions
-
-    # se a posição (i,j) tiver uma peça da mesma cor da peça original, então verifica as posições adjacentes
-    neighbors = [(i-1, j), (i+1, j), (i, j-1), (i, j+1)]  
-    # para cada posição adjacente, executa a função _flood_fill recursivamente
-    for x,y in neighbors:
-        result, group_positions = _flood_fill(x,y,original_piece,board,group_positions,_visited)
-        if result:
-            return True, group_positions
-    # esta posição tem a mesma cor da peça original e não tem liberdade
-    group_positions.add((i,j))
-    return False, group_positions
+    neighbours = neighbour_table(len(board))
+    group_positions = {(i,j)}
+    # percorre o grupo com uma pilha, usando a tabela de vizinhos
+    stack = [(i,j)]
+    while stack:
+        p = stack.pop()
+        for x,y in neighbours[p]:
+            position = board[x][y]
+            # se uma posição adjacente for vazia, então o grupo tem liberdade
+            if position == 0:
+                return None
+            # as peças da mesma cor fazem parte do grupo
+            if position == original_piece and (x,y) not in group_positions:
+                group_positions.add((x,y))
+                stack.append((x,y))
+    # o grupo não tem liberdades
+    return group_positions
+
+
+# marca as regiões vazias de um batch de boards (N,n,n): cada posição vazia fica com o menor
+# índice plano (i*n+j) da sua região e as posições com peças ficam com n*n
+def label_empty_regions(boards):
+    boards = np.asarray(boards)
+    N, n = boards.shape[0], boards.shape[1]
+    empty = boards == 0
+    labels = np.where(empty, np.arange(n*n).reshape(n, n), n*n)
+    while True:
+        # cada posição vazia fica com o menor label entre o seu e o dos vizinhos
+        new = labels.copy()
+        np.minimum(new[:, 1:, :], labels[:, :-1, :], out=new[:, 1:, :])
+        np.minimum(new[:, :-1, :], labels[:, 1:, :], out=new[:, :-1, :])
+        np.minimum(new[:, :, 1:], labels[:, :, :-1], out=new[:, :, 1:])
+        np.minimum(new[:, :, :-1], labels[:, :, 1:], out=new[:, :, :-1])
+        new[~empty] = n*n
+        # salta para o label do label (o label é sempre uma posição da mesma região)
+        flat = np.append(new.reshape(N, n*n), np.full((N, 1), n*n), axis=1)
+        new = np.take_along_axis(flat, flat, axis=1)[:, :-1].reshape(N, n, n)
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+# identifica os grupos de peças num batch de boards (N,n,n): retorna um array (N,n,n) em que cada peça
+# tem o label do seu grupo (a menor posição achatada i*n+j do grupo) e as posições vazias têm n*n
+def label_groups(boards):
+    boards = np.asarray(boards)
+    N, n = boards.shape[0], boards.shape[1]
+    stones = boards != 0
+    labels = np.where(stones, np.arange(n*n).reshape(n, n), n*n)
+    # pares de posições vizinhas com peças da mesma cor
+    down = stones[:, 1:, :] & (boards[:, 1:, :] == boards[:, :-1, :])
+    right = stones[:, :, 1:] & (boards[:, :, 1:] == boards[:, :, :-1])
+    while True:
+        # cada peça fica com o menor label entre o seu e o das peças vizinhas da mesma cor
+        new = labels.copy()
+        new[:, 1:, :] = np.where(down, np.minimum(new[:, 1:, :], labels[:, :-1, :]), new[:, 1:, :])
+        new[:, :-1, :] = np.where(down, np.minimum(new[:, :-1, :], labels[:, 1:, :]), new[:, :-1, :])
+        new[:, :, 1:] = np.where(right, np.minimum(new[:, :, 1:], labels[:, :, :-1]), new[:, :, 1:])
+        new[:, :, :-1] = np.where(right, np.minimum(new[:, :, :-1], labels[:, :, 1:]), new[:, :, :-1])
+        # salta para o label do label (o label é sempre uma posição do mesmo grupo)
+        flat = np.append(new.reshape(N, n*n), np.full((N, 1), n*n), axis=1)
+        new = np.take_along_axis(flat, flat, axis=1)[:, :-1].reshape(N, n, n)
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+# retorna o número de territórios de cada jogador num batch de boards (N,n,n), num array (N,2)
+# com as colunas (jogador 1, jogador -1); uma região vazia é território de um jogador se só
+# tocar em peças dele
+def count_territories(boards):
+    boards = np.asarray(boards)
+    N, n = boards.shape[0], boards.shape[1]
+    labels = label_empty_regions(boards).reshape(N, n*n)
+    empty = labels < n*n
+
+    # cores das posições vizinhas de cada posição (fora do tabuleiro conta como vazio)
+    padded = np.pad(boards, ((0, 0), (1, 1), (1, 1)))
+    neighbours = [padded[:, :-2, 1:-1], padded[:, 2:, 1:-1], padded[:, 1:-1, :-2], padded[:, 1:-1, 2:]]
+    touches_black = np.any([nb == 1 for nb in neighbours], axis=0).reshape(N, n*n)
+    touches_white = np.any([nb == -1 for nb in neighbours], axis=0).reshape(N, n*n)
+
+    # cores em que cada região toca, com labels diferentes para cada board
+    region = labels + np.arange(N)[:, None] * (n*n)
+    black_border = np.bincount(region[empty], weights=touches_black[empty], minlength=N*n*n)
+    white_border = np.bincount(region[empty], weights=touches_white[empty], minlength=N*n*n)
+    owner = np.zeros(N*n*n, dtype=int)
+    owner[(black_border > 0) & (white_border == 0)] = 1
+    owner[(white_border > 0) & (black_border == 0)] = -1
+    point_owner = np.where(empty, owner[np.where(empty, region, 0)], 0)
+    return np.stack([(point_owner == 1).sum(axis=1), (point_owner == -1).sum(axis=1)], axis=1)
+
+
+# retorna os scores (peças + territórios, mais o KOMI para o jogador -1) de um batch de boards
+# (N,n,n), num array (N,2) com as colunas (jogador 1, jogador -1)
+def score_boards(boards):
+    boards = np.asarray(boards)
+    territories = count_territories(boards)
+    stones = np.stack([(boards == 1).sum(axis=(1, 2)), (boards == -1).sum(axis=(1, 2))], axis=1)
+    scores = (territories + stones).astype(float)
+    scores[:, 1] += KOMI
+    return scores
 
 
 # função que retorna o grupo de territórios capturados e o jogador que capturou
 def get_captured_territories(i,j,board):
-    ct_group, captor = _get_captured_territories(i,j,board,ct_group=set(),captor=0,visited=set())
-    return ct_group, captor
-
-
-# função auxiliar que retorna o grupo de territórios capturados e o jogador que capturou
-def _get_captured_territories(i,j,board,ct_group,captor,visited):
-    # Verifica se a posição (i,j) já foi visitada ou se é inválida
-    if (i,j) in visited or invalid_position(i,j,len(board)):
-        return ct_group, captor
-    # adiciona a posição (i,j) ao set de posições visitadas
-    visited.add((i,j)) 
-    # se a posição (i,j) não estiver vazia, então verifica a cor da peça
+    # se a posição (i,j) não estiver vazia, o captor é a cor da peça
     if board[i][j] != 0:
-        if captor == 0:
-            # se captor for 0, então captor recebe a cor da peça
-            captor = board[i][j] 
-            if captor == 1:
-                return ct_group, captor
-            elif captor == -1:
-                return ct_group, captor
-        # se a cor da peça for diferente da cor do captor, então não há territórios capturados
-        elif board[i][j]!=captor:   
-            return None,0  
-        # a peça é capturada pelo mesmo jogador que capturou as peças anteriores
-        if captor == 1:
-            return ct_group, captor 
-        # a peça é capturada pelo mesmo jogador que capturou as peças anteriores
-        elif captor == -1:
-            return ct_group, captor
-    # se a posição (i,j) estiver vazia, então é adicionada ao grupo de territórios
-    ct_group.add((i,j))
-    # se a posição (i,j) estiver vazia, então verifica as posições adjacentes
-    neighbors = [(i-1, j), (i+1, j), (i, j-1), (i, j+1)]  
-    for x,y in neighbors:
-        ct_group,captor = _get_captured_territories(x,y,board,ct_group,captor,visited)
-        # se (i,j) tiver links para peças de jogadores diferentes, então não há territórios capturados
-        if ct_group is None:
-            return None,0   
-    # retorna o grupo de territórios capturados e o jogador que capturou    
+        return set(), board[i][j]
+    neighbours = neighbour_table(len(board))
+    ct_group = {(i,j)}
+    captor = 0
+    # percorre a região vazia com uma pilha, usando a tabela de vizinhos
+    stack = [(i,j)]
+    while stack:
+        p = stack.pop()
+        for x,y in neighbours[p]:
+            position = board[x][y]
+            # se a posição estiver vazia, é adicionada ao grupo de territórios
+            if position == 0:
+                if (x,y) not in ct_group:
+                    ct_group.add((x,y))
+                    stack.append((x,y))
+            # a primeira peça encontrada define o captor
+            elif captor == 0:
+                captor = position
+            # se a região tocar em peças de jogadores diferentes, então não há territórios capturados
+            elif position != captor:
+                return None, 0
+    # retorna o grupo de territórios capturados e o jogador que capturou
     return ct_group, captor
     
     
@@ -511,8 +877,8 @@ if __name__ == "__main__":
 
     try:
         board_size = int(sys.argv[1])
-        if board_size not in [7, 9]:
-            raise ValueError("Invalid board size. Please choose 7 or 9.")
+        if board_size not in [7, 9, 13, 19]:
+            raise ValueError("Invalid board size. Please choose 7, 9, 13 or 19.")
     except ValueError as e:
         print(f"Error: {e}")
         sys.exit(1)
@@ -520,5 +886,5 @@ if __name__ == "__main__":
     main(board_size)
 
 ## Para rodar é python go.py 7
-############################ 9
+############################ 9, 13 ou 19
 ## Pressionar P para passar
\ No newline at end of file